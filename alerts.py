@@ -1,13 +1,20 @@
 # alerts.py
 from dataclasses import dataclass
 from typing import Literal
+import numpy as np
 import pandas as pd
 from config import ALERTS
+from instrument import timed
 
 Level = Literal["GREEN", "YELLOW", "RED"]
 
 LEVEL_EMOJI = {"GREEN": "OK", "YELLOW": "WARN", "RED": "ALERT"}
 LEVEL_COLOR = {"GREEN": "#2ecc71", "YELLOW": "#f39c12", "RED": "#e74c3c"}
+LEVEL_POINTS = {"GREEN": 0, "YELLOW": 10, "RED": 25}
+
+# Level matrix codes (evaluate_frame); -1 = no data on that date
+LEVELS = ["GREEN", "YELLOW", "RED"]
+LEVEL_CODE = {name: code for code, name in enumerate(LEVELS)}
 
 
 @dataclass
@@ -19,19 +26,82 @@ class Alert:
     message: str
 
 
+@dataclass(frozen=True)
+class Rule:
+    key: str
+    label: str
+    column: str
+    direction: Literal["above", "below"]
+    red: float
+    yellow: float
+    decimals: int
+    messages: dict
+
+
+# ── RULE ENGINE ─────────────────────────────────────────────
+class RuleSet:
+    # All rules are evaluated together: values are laid out as a (dates x rules)
+    # matrix and compared against threshold vectors, so adding rules widens the
+    # arrays instead of adding Python-level checks.
+    def __init__(self, rules: list[Rule]):
+        self.rules = rules
+        self.keys = [r.key for r in rules]
+        self.columns = [r.column for r in rules]
+        # "below" rules are flipped so every comparison becomes value > threshold
+        self.sign = np.array([1.0 if r.direction == "above" else -1.0 for r in rules])
+        self.red = self.sign * np.array([r.red for r in rules], dtype="float64")
+        self.yellow = self.sign * np.array([r.yellow for r in rules], dtype="float64")
+        self.points = np.array([0] + [LEVEL_POINTS[name] for name in LEVELS], dtype="int16")
+
+    def levels(self, values: np.ndarray) -> np.ndarray:
+        x = values * self.sign
+        lvl = (x > self.yellow).astype("int8") + (x > self.red)
+        lvl[np.isnan(x)] = -1
+        return lvl
+
+    @timed("alerts.evaluate_frame")
+    def evaluate_frame(self, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+        values = df.reindex(columns=self.columns).to_numpy(dtype="float64")
+        lvl = self.levels(values)
+        matrix = pd.DataFrame(lvl, index=df.index, columns=self.keys)
+        score = np.minimum(self.points[lvl + 1].sum(axis=1), 100)
+        return matrix, pd.Series(score, index=df.index, name="risk_score")
+
+    @timed("alerts.evaluate_row")
+    def evaluate_row(self, last: pd.Series) -> list[Alert]:
+        values = np.array([last.get(c, np.nan) for c in self.columns], dtype="float64")
+        lvl = self.levels(values[None, :])[0]
+        alerts = []
+        for rule, v, code in zip(self.rules, values.tolist(), lvl):
+            if code < 0:
+                continue
+            level = LEVELS[code]
+            msg = rule.messages[level].format(label=rule.label, value=round(v, rule.decimals),
+                                              red=f"{rule.red:g}", yellow=f"{rule.yellow:g}")
+            alerts.append(Alert(rule.key, rule.label, v, level, msg))
+        return alerts
+
+
+def compile_rules(cfg: dict = ALERTS) -> RuleSet:
+    return RuleSet([
+        Rule(key, c["label"], c["column"], c["direction"],
+             float(c["red"]), float(c["yellow"]), c.get("decimals", 2), dict(c["messages"]))
+        for key, c in cfg.items()
+    ])
+
+
+DEFAULT_RULES = compile_rules()
+
+
 class AlertEngine:
-    def __init__(self, last: pd.Series):
+    def __init__(self, last: pd.Series, rules: RuleSet = None):
         self.last = last
+        self.rules = rules if rules is not None else DEFAULT_RULES
         self.alerts: list[Alert] = []
         self._evaluate()
 
     def risk_score(self) -> int:
-        score = 0
-        for a in self.alerts:
-            if a.level == "RED":
-                score += 25
-            elif a.level == "YELLOW":
-                score += 10
+        score = sum(LEVEL_POINTS[a.level] for a in self.alerts)
         return min(score, 100)
 
     def risk_label(self) -> tuple[str, str]:
@@ -42,71 +112,11 @@ class AlertEngine:
             return "ELEVATED RISK", LEVEL_COLOR["YELLOW"]
         return "LOW RISK", LEVEL_COLOR["GREEN"]
 
+    @staticmethod
+    def evaluate_frame(df: pd.DataFrame, rules: RuleSet = None) -> tuple[pd.DataFrame, pd.Series]:
+        # Every rule on every row. Returns an int8 level matrix (dates x alert
+        # keys, LEVEL_CODE, -1 = no data) and the composite risk score per date.
+        return (rules if rules is not None else DEFAULT_RULES).evaluate_frame(df)
+
     def _evaluate(self):
-        self._check_vix(self.last)
-        self._check_curves(self.last)
-        self._check_hy_spread(self.last)
-        self._check_cpi(self.last)
-        self._check_sp500(self.last)
-
-    def _add(self, key, label, value, level, message):
-        self.alerts.append(Alert(key, label, value, level, message))
-
-    def _check_vix(self, last):
-        if "VIX" not in last or pd.isna(last["VIX"]):
-            return
-        v = last["VIX"]
-        cfg = ALERTS["VIX"]
-        if v > cfg["high"]:
-            self._add("VIX", cfg["label"], v, "RED", "VIX a " + str(round(v, 1)) + " - marches stresses (>25)")
-        elif v > cfg["low"]:
-            self._add("VIX", cfg["label"], v, "YELLOW", "VIX a " + str(round(v, 1)) + " - volatilite moderee (15-25)")
-        else:
-            self._add("VIX", cfg["label"], v, "GREEN", "VIX a " + str(round(v, 1)) + " - marches calmes (<15)")
-
-    def _check_curves(self, last):
-        for key in ["Curve_10_2", "Curve_10_3m"]:
-            if key not in last or pd.isna(last[key]):
-                continue
-            v = last[key]
-            cfg = ALERTS[key]
-            if v < cfg["inversion"]:
-                self._add(key, cfg["label"], v, "RED", cfg["label"] + " inversee a " + str(round(v, 2)) + "% - risque recession")
-            elif v < 0.25:
-                self._add(key, cfg["label"], v, "YELLOW", cfg["label"] + " quasi-plate a " + str(round(v, 2)) + "%")
-            else:
-                self._add(key, cfg["label"], v, "GREEN", cfg["label"] + " normale a " + str(round(v, 2)) + "%")
-
-    def _check_hy_spread(self, last):
-        if "HY_Spread" not in last or pd.isna(last["HY_Spread"]):
-            return
-        v = last["HY_Spread"]
-        cfg = ALERTS["HY_Spread"]
-        if v > cfg["high"] / 100:
-            self._add("HY_Spread", cfg["label"], v, "RED", "HY Spread a " + str(round(v, 2)) + "% - stress credit eleve")
-        elif v > cfg["low"] / 100:
-            self._add("HY_Spread", cfg["label"], v, "YELLOW", "HY Spread a " + str(round(v, 2)) + "% - credit moderement large")
-        else:
-            self._add("HY_Spread", cfg["label"], v, "GREEN", "HY Spread a " + str(round(v, 2)) + "% - credit sain")
-
-    def _check_cpi(self, last):
-        if "CPI_YoY" not in last or pd.isna(last["CPI_YoY"]):
-            return
-        v = last["CPI_YoY"]
-        if v > 4.0:
-            self._add("CPI", "CPI YoY", v, "RED", "CPI a " + str(round(v, 1)) + "% - inflation bien au-dessus de la cible")
-        elif v > 2.5:
-            self._add("CPI", "CPI YoY", v, "YELLOW", "CPI a " + str(round(v, 1)) + "% - inflation legerement au-dessus")
-        else:
-            self._add("CPI", "CPI YoY", v, "GREEN", "CPI a " + str(round(v, 1)) + "% - inflation proche de la cible")
-
-    def _check_sp500(self, last):
-        if "SP500_20D_Ret" not in last or pd.isna(last["SP500_20D_Ret"]):
-            return
-        v = last["SP500_20D_Ret"]
-        if v < -10:
-            self._add("SP500", "S&P 500 (20J)", v, "RED", "S&P 500 en baisse de " + str(round(v, 1)) + "% sur 20j - forte correction")
-        elif v < -5:
-            self._add("SP500", "S&P 500 (20J)", v, "YELLOW", "S&P 500 en baisse de " + str(round(v, 1)) + "% sur 20j - correction moderee")
-        else:
-            self._add("SP500", "S&P 500 (20J)", v, "GREEN", "S&P 500 a " + str(round(v, 1)) + "% sur 20j - stable")
+        self.alerts = self.rules.evaluate_row(self.last)
@@ -0,0 +1,317 @@
+# analytics.py — rolling analytics over every SERIES column
+# (RollingCorrelation, further down, keeps the cross-asset correlation matrix.)
+# For each window w (rows of the daily frame) and series:
+#   Ret   change over the last w rows: % for prices and indices, points for
+#         rates and spreads (POINT_CATEGORIES, whose levels can sit near 0)
+#   Vol   annualized standard deviation of the 1-row changes over w rows
+#   Z     (level - mean) / std of the level over w rows
+#   DD    distance below the highest level of the last w rows (% or points)
+# The series are stacked into one (dates x series) matrix and each statistic
+# is computed for all of them at once: window sums from cumulative sums,
+# window maxima from a strided view. As with pandas' rolling() defaults, a
+# value needs w valid observations in its window.
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from instrument import span
+from config import (
+    SERIES, ANALYTICS_WINDOWS, ANALYTICS_PERIODS_PER_YEAR,
+    ROLLING_CORR_WINDOW, CORR_MIN_PERIODS, CORR_SNAPSHOTS, CORR_RESYNC,
+)
+
+STATS = ["Ret", "Vol", "Z", "DD"]
+POINT_CATEGORIES = {"Rates", "Curve", "Credit"}
+
+
+# ── KERNELS ─────────────────────────────────────────────────
+def _lag(X, w):
+    out = np.full_like(X, np.nan)
+    if w < len(X):
+        out[w:] = X[:len(X) - w]
+    return out
+
+def _change(X, w, points):
+    # change over w rows, column by column in points or %
+    prev = _lag(X, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(points, X - prev, (X / prev - 1) * 100)
+
+def _window_sums(X, w):
+    # -> (sum, sum of squares) over the trailing w rows, NaN unless all w are
+    # valid, and the centered X they were taken on. Columns are centered on
+    # their mean so the cumulative sums stay small.
+    valid = ~np.isnan(X)
+    n = valid.sum(axis=0)
+    mean = np.where(n > 0, np.where(valid, X, 0.0).sum(axis=0) / np.maximum(n, 1), 0.0)
+    Xc = X - mean
+    s1 = np.full_like(X, np.nan)
+    s2 = np.full_like(X, np.nan)
+    if w <= len(X):
+        zero = np.zeros((1, X.shape[1]))
+        c1 = np.vstack([zero, np.cumsum(np.where(valid, Xc, 0.0), axis=0)])
+        c2 = np.vstack([zero, np.cumsum(np.where(valid, Xc * Xc, 0.0), axis=0)])
+        cn = np.vstack([zero, np.cumsum(valid, axis=0)])
+        full = (cn[w:] - cn[:-w]) == w
+        s1[w - 1:] = np.where(full, c1[w:] - c1[:-w], np.nan)
+        s2[w - 1:] = np.where(full, c2[w:] - c2[:-w], np.nan)
+    return s1, s2, Xc
+
+def _std(s1, s2, w):
+    # sample std from window sums; exactly 0 for flat windows (e.g. a
+    # forward-filled monthly series) rather than a round-off residue
+    with np.errstate(invalid="ignore"):
+        var = (s2 - s1 * s1 / w) / max(w - 1, 1)
+        flat = var <= 1e-12 * (s2 / w + 1e-300)
+    return np.sqrt(np.where(flat, 0.0, np.maximum(var, 0.0)))
+
+def _window_max(X, w):
+    out = np.full_like(X, np.nan)
+    if w <= len(X):
+        out[w - 1:] = sliding_window_view(X, w, axis=0).max(axis=-1)
+    return out
+
+
+def rolling_stats(X, w, points, periods_per_year=ANALYTICS_PERIODS_PER_YEAR):
+    # X: (dates x series) levels; points: bool per series. -> (dates, series, STATS)
+    X = np.asarray(X, dtype="float64")
+    points = np.asarray(points, dtype=bool)
+    out = np.empty(X.shape + (len(STATS),))
+    out[..., 0] = _change(X, w, points)
+
+    s1, s2, _ = _window_sums(_change(X, 1, points), w)
+    out[..., 1] = _std(s1, s2, w) * np.sqrt(periods_per_year)
+
+    s1, s2, Xc = _window_sums(X, w)
+    sd = _std(s1, s2, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., 2] = np.where(sd > 0, (Xc - s1 / w) / sd, np.nan)
+
+    peak = _window_max(X, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., 3] = np.where(points, X - peak, (X / peak - 1) * 100)
+    return out
+
+
+# ── CACHE ───────────────────────────────────────────────────
+class RollingAnalytics:
+    # Results are cached per (series, window) for one frame version; a new
+    # version (MarketData load/refresh) drops them. Missing pairs are filled
+    # by one vectorized pass per window over every series that lacks it.
+    def __init__(self, series=None, windows=None):
+        self.series = list(series or SERIES)
+        self.windows = list(windows or ANALYTICS_WINDOWS)
+        self.version = None
+        self.index = None
+        self.cache = {}         # (series, window) -> (dates x STATS) float64 array
+        self.lock = threading.Lock()
+
+    def compute(self, frame, version, series=None, windows=None):
+        # frame: CompactFrame; version: its content version (Snapshot.version)
+        series = [s for s in (series or self.series) if s in frame.data]
+        windows = list(windows or self.windows)
+        with self.lock, span("analytics.compute") as sp:
+            if version != self.version:
+                self.cache.clear()
+                self.version = version
+                self.index = frame.index
+            todo = {}
+            for w in windows:
+                missing = [s for s in series if (s, w) not in self.cache]
+                if missing:
+                    todo[w] = missing
+            sp.hit = not todo
+            if todo:
+                names = [s for s in series if any(s in m for m in todo.values())]
+                X = np.column_stack([frame.column(s) for s in names])
+                points = np.array([SERIES.get(s, {}).get("category") in POINT_CATEGORIES for s in names])
+                for w, missing in todo.items():
+                    cols = [names.index(s) for s in missing]
+                    stats = rolling_stats(X[:, cols], w, points[cols])
+                    for j, s in enumerate(missing):
+                        self.cache[(s, w)] = stats[:, j, :]
+            return {(s, w): self.cache[(s, w)] for s in series for w in windows}
+
+    def get(self, frame, version, series, window):
+        stats = self.compute(frame, version, [series], [window])[(series, window)]
+        return pd.DataFrame(stats, index=self.index, columns=STATS)
+
+    def latest(self, frame, version, window, series=None):
+        # one row per series: its statistics on the last date
+        stats = self.compute(frame, version, series, [window])
+        names = [s for s, _ in stats]
+        return pd.DataFrame([stats[(s, window)][-1] for s in names], index=names, columns=STATS)
+
+
+ANALYTICS = RollingAnalytics()
+
+
+# ── CORRELATION ─────────────────────────────────────────────
+def daily_changes(frame, closes=None, start=0):
+    # 1-row changes from grid row `start` on: every SERIES column of a
+    # CompactFrame (points or %, as in rolling_stats) plus the % change of
+    # each ticker close (date x ticker), both on the frame's dates.
+    names = [s for s in SERIES if s in frame.data]
+    lo = max(start - 1, 0)
+    X = np.column_stack([frame.column(s, lo) for s in names]) if names else np.empty((len(frame) - lo, 0))
+    points = np.array([SERIES[s]["category"] in POINT_CATEGORIES for s in names], dtype=bool)
+    out = pd.DataFrame(_change(X, 1, points), index=frame.index[lo:], columns=names)
+    if closes is not None and not closes.empty:
+        rets = closes.sort_index().pct_change(fill_method=None) * 100
+        out = out.join(rets.reindex(out.index))
+    return out.iloc[start - lo:]
+
+
+class RollingCorrelation:
+    # Rolling N x N correlation of daily changes, kept as running sums over the
+    # last `window` days. For each pair (i, j), over the days both are valid:
+    #   n[i,j]   count      sx[i,j]  sum x_i      sxx[i,j]  sum x_i^2
+    #   sxy[i,j] sum x_i * x_j
+    # A new day adds its outer products and drops those of the day leaving
+    # the window: O(N^2) per day rather than O(N^2 * window) for a recompute.
+    # The sums are rebuilt from the window every `resync` days so round-off
+    # cannot build up. The last `keep` daily matrices are kept as snapshots.
+    # Days already pushed can be rewritten upstream (a late print re-filled by
+    # MarketData.refresh, today's close moving intraday): update() rewinds to
+    # the first one that changed and pushes again from there.
+    def __init__(self, window=ROLLING_CORR_WINDOW, min_periods=CORR_MIN_PERIODS,
+                 keep=CORR_SNAPSHOTS, resync=CORR_RESYNC):
+        self.window = window
+        self.min_periods = min_periods
+        self.keep = keep
+        self.resync = resync
+        self.lock = threading.Lock()
+        self.reset([])
+
+    def reset(self, names):
+        k = len(names)
+        self.names = list(names)
+        self.days = deque()                 # (date, values with NaN -> 0, valid mask)
+        self.seen = deque(maxlen=self.window + self.keep)  # same, for every day the snapshots depend on
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+        self.last = None
+        self.since_resync = 0
+        self.snapshots = deque(maxlen=self.keep)    # (date, float32 matrix)
+
+    def _add(self, x, m, sign):
+        mf = m.astype("float64")
+        self.n += sign * np.outer(mf, mf)
+        self.sx += sign * np.outer(x, mf)
+        self.sxx += sign * np.outer(x * x, mf)
+        self.sxy += sign * np.outer(x, x)
+
+    def _rebuild(self):
+        X = np.array([x for _, x, _ in self.days])
+        M = np.array([m for _, _, m in self.days], dtype="float64")
+        self.n = M.T @ M
+        self.sx = X.T @ M
+        self.sxx = (X * X).T @ M
+        self.sxy = X.T @ X
+        self.since_resync = 0
+
+    def push(self, date, values, snapshot=True):
+        # values: one day's changes in self.names order (NaN = no observation)
+        v = np.asarray(values, dtype="float64")
+        m = ~np.isnan(v)
+        x = np.where(m, v, 0.0)
+        self.days.append((date, x, m))
+        self.seen.append((date, x, m))
+        self._add(x, m, 1.0)
+        if len(self.days) > self.window:
+            _, x0, m0 = self.days.popleft()
+            self._add(x0, m0, -1.0)
+        self.since_resync += 1
+        if self.since_resync >= self.resync:
+            self._rebuild()
+        self.last = date
+        if snapshot:
+            self.snapshots.append((date, self._matrix()))
+
+    def _matrix(self):
+        n, sx, sy = self.n, self.sx, self.sx.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = n * self.sxy - sx * sy
+            var = (n * self.sxx - sx * sx) * (n * self.sxx.T - sy * sy)
+            c = cov / np.sqrt(var)
+        c[(n < self.min_periods) | ~(var > 0)] = np.nan
+        np.clip(c, -1.0, 1.0, out=c)
+        return c.astype("float32")
+
+    def _first_rewritten(self, index, X):
+        # Earliest pushed day whose changes differ from the rows given (or
+        # that appeared/disappeared since), None if none before self.last did.
+        pushed = {d: (x, m) for d, x, m in self.seen}
+        given = {d: row for d, row in zip(index, X)}
+        lo = max(self.seen[0][0], index[0])
+        for date in sorted(d for d in set(pushed) | set(given) if lo <= d <= self.last):
+            if date not in pushed or date not in given:
+                return date
+            x, m = pushed[date]
+            row = given[date]
+            valid = ~np.isnan(row)
+            if not (np.array_equal(m, valid) and np.array_equal(x, np.where(valid, row, 0.0))):
+                return date
+        return None
+
+    def _rewind(self, date, index, X):
+        # Takes the days from `date` on back out of the sums (and their
+        # snapshots), then re-adds in front the days they had pushed out of
+        # the window, from the rows given.
+        while self.days and self.days[-1][0] >= date:
+            _, x, m = self.days.pop()
+            self._add(x, m, -1.0)
+        while self.seen and self.seen[-1][0] >= date:
+            self.seen.pop()
+        while self.snapshots and self.snapshots[-1][0] >= date:
+            self.snapshots.pop()
+        oldest = self.days[0][0] if self.days else date
+        stop = index.searchsorted(oldest)
+        for i in range(stop - 1, max(stop - (self.window - len(self.days)), 0) - 1, -1):
+            v = X[i]
+            m = ~np.isnan(v)
+            x = np.where(m, v, 0.0)
+            self.days.appendleft((index[i], x, m))
+            self._add(x, m, 1.0)
+        self.last = self.seen[-1][0] if self.seen else None
+
+    def update(self, changes):
+        # changes: daily_changes() rows, oldest first (window + keep rows, so
+        # every kept snapshot can be recomputed). Pushed days that changed are
+        # rewound and pushed again, then the days after self.last are pushed.
+        # A different instrument set, a gap back to self.last, or a rewrite
+        # older than the current window restarts from the rows given.
+        with self.lock, span("analytics.corr_update") as sp:
+            cols = list(changes.columns)
+            index, X = changes.index, changes.to_numpy(dtype="float64")
+            if cols != self.names or self.last is None or self.last < index[0]:
+                self.reset(cols)
+            else:
+                first = self._first_rewritten(index, X)
+                if first is not None and self.days and first >= self.days[0][0] and first > self.seen[0][0]:
+                    self._rewind(first, index, X)
+                elif first is not None:
+                    self.reset(cols)
+            start = 0 if self.last is None else int(index.searchsorted(self.last, side="right"))
+            sp.hit = start == len(index)
+            first_kept = len(index) - start - self.keep    # older days would be evicted anyway
+            for i, (date, row) in enumerate(zip(index[start:], X[start:])):
+                self.push(date, row, snapshot=i >= first_kept)
+            return len(index) - start
+
+    def matrix(self, date=None):
+        # Snapshot for `date` (default the latest) as a labelled DataFrame.
+        with self.lock:
+            for d, c in reversed(self.snapshots):
+                if date is None or d <= date:
+                    return pd.DataFrame(c, index=self.names, columns=self.names)
+        return pd.DataFrame()
+
+    def history(self):
+        # Every kept snapshot, oldest first: {date: DataFrame}
+        with self.lock:
+            return {d: pd.DataFrame(c, index=self.names, columns=self.names)
+                    for d, c in self.snapshots}
@@ -1,19 +1,32 @@
 # app.py — Market Tracker | Bloomberg-core UI
+import hashlib
+import json
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 import plotly.graph_objects as go
 
-from data   import MarketData
-from alerts import AlertEngine, LEVEL_COLOR, LEVEL_EMOJI
-from live   import LiveData
-from report import generate_pdf
+from alerts   import LEVEL_COLOR, LEVEL_EMOJI
+from report   import REPORTS
+from config   import (CHART_WIDTH_PX, SERVICE_URL, TAPE_RENDER_INTERVAL, REPORT_POLL_INTERVAL,
+                      SERIES, ANALYTICS_WINDOWS, ROLLING_RETURN_WINDOW)
+from snapshot import SnapshotHub
+from analytics import ANALYTICS
+from service  import ServiceClient
+from instrument import METRICS, current, span
 from charts import (
     chart_sp500, chart_rates, chart_curve, chart_vix,
     chart_inflation, chart_credit, chart_commodities,
-    chart_correlation, chart_unemployment,
+    chart_correlation, chart_unemployment, chart_corr_matrix,
 )
 
+CHARTS = {
+    "sp500": chart_sp500, "vix": chart_vix, "rates": chart_rates,
+    "curve": chart_curve, "inflation": chart_inflation,
+    "unemployment": chart_unemployment, "credit": chart_credit,
+    "commodities": chart_commodities, "correlation": chart_correlation,
+}
+
 st.set_page_config(page_title="MKTTRK", page_icon="*", layout="wide")
 
 st.markdown("""
@@ -154,21 +167,19 @@ if "show_charts"  not in st.session_state: st.session_state.show_charts  = True
 
 
 # ── CACHE ───────────────────────────────────────────────────
-@st.cache_data(ttl=900, show_spinner=False)
-def load_fred_data():
-    return MarketData().load()
-
-@st.cache_data(ttl=300, show_spinner=False)
-def load_quotes():
-    return LiveData().get_quotes()
-
-@st.cache_data(ttl=600, show_spinner=False)
-def load_news():
-    return LiveData().get_news(query="stock market economy federal reserve", page_size=12)
+@st.cache_resource(show_spinner=False)
+def hub():
+    # One hub per process: a single MarketData/LiveData pair, refreshed in the
+    # background, publishing one shared read-only Snapshot for every session.
+    # With SERVICE_URL set, read the warm copy kept by service.py instead.
+    if SERVICE_URL:
+        return ServiceClient(SERVICE_URL)
+    return SnapshotHub().start()
 
-@st.cache_data(ttl=300, show_spinner=False)
 def load_history(ticker, period):
-    return LiveData().get_history(ticker, period)
+    # Served from live.HISTORY (shared by all sessions), which the hub keeps
+    # warm in the background; a stale copy is shown while it revalidates.
+    return hub().history(ticker, period)
 
 def fmt(val, decimals=2, suffix=""):
     if val is None or pd.isna(val): return "N/A"
@@ -181,22 +192,42 @@ CHART_STYLE = dict(
     legend=dict(bgcolor="rgba(0,0,0,0)"),
     margin=dict(l=10, r=10, t=36, b=10),
 )
+STYLE_VERSION = hashlib.sha1(repr(CHART_STYLE).encode()).hexdigest()[:8]
 def apply_style(fig):
     fig.update_layout(**CHART_STYLE)
     return fig
 
+# Figures are rebuilt only when the data, the period or the style change;
+# toggles and notes rerun the script but reuse the cached figure objects.
+@st.cache_resource(max_entries=64, show_spinner=False)
+def cached_chart(name, version, lookback, style, width, _df):
+    current().hit = False     # only runs on a cache miss
+    return apply_style(CHARTS[name](_df, width=width))
+
+def chart(name, width=CHART_WIDTH_PX):
+    lookback = (st.session_state.lookback, df.index[0])
+    with span("app.chart_cache") as sp:
+        sp.hit = True
+        return cached_chart(name, data_version, lookback, STYLE_VERSION, width, df)
+
+def show_chart(name, width=CHART_WIDTH_PX):
+    # app.render covers figure lookup plus Plotly serialization to the browser
+    with span("app.render." + name):
+        st.plotly_chart(chart(name, width), use_container_width=True)
+
 
 # ── LOAD DATA ────────────────────────────────────────────────
-with st.spinner(""):
-    df_full = load_fred_data()
-with st.spinner(""):
-    quotes = load_quotes()
-
-days_map = {"6M":180,"1Y":365,"2Y":730,"3Y":1095,"ALL":9999}
-cutoff   = pd.Timestamp.today() - pd.Timedelta(days=days_map[st.session_state.lookback])
-df       = df_full[df_full.index >= cutoff].copy()
+with st.spinner(""), span("app.snapshot"):
+    snap = hub().get()      # one consistent snapshot for the whole run
+if snap is None:
+    st.error("FRED data unavailable - retrying in the background.")
+    st.stop()
+
+data_version = snap.version
+quotes       = snap.quotes
+df       = snap.view(st.session_state.lookback)   # lookback rows, expanded from the compact frame
 last     = df.iloc[-1]
-engine   = AlertEngine(last)
+engine   = snap.engine
 score    = engine.risk_score()
 risk_label, risk_color = engine.risk_label()
 now_str  = datetime.now().strftime("%Y-%m-%d  %H:%M")
@@ -236,17 +267,38 @@ with cb[8]:
     lbl = "CHARTS ON" if st.session_state.show_charts else "CHARTS OFF"
     if st.button(lbl): st.session_state.show_charts = not st.session_state.show_charts; st.rerun()
 with cb[9]:
-    if st.button("REFRESH DATA"): st.cache_data.clear(); st.rerun()
+    if st.button("REFRESH DATA"): hub().refresh(); st.rerun()
 
 
 # ── SCROLLING TICKER ─────────────────────────────────────────
-if not quotes.empty:
-    items = ""
-    for _, r in quotes.iterrows():
-        cls   = "t-up" if r["Chg %"] >= 0 else "t-down"
-        arrow = "+" if r["Chg %"] >= 0 else ""
-        items += f'<div class="ticker-item"><span class="ticker-sym">{r["Ticker"]}</span><span class="ticker-px">${r["Prix"]:,.2f}</span><span class="{cls}">{arrow}{r["Chg %"]:.2f}%</span></div>'
-    st.markdown(f'<div class="ticker-wrapper"><div class="ticker-track">{items+items}</div></div>', unsafe_allow_html=True)
+def tape_html(q):
+    up    = q["Chg %"] >= 0
+    items = ('<div class="ticker-item"><span class="ticker-sym">' + q["Ticker"]
+             + '</span><span class="ticker-px">$' + q["Prix"].map("{:,.2f}".format)
+             + '</span><span class="' + up.map({True: "t-up", False: "t-down"})
+             + '">' + up.map({True: "+", False: ""}) + q["Chg %"].map("{:.2f}".format)
+             + '%</span></div>').str.cat()
+    return f'<div class="ticker-wrapper"><div class="ticker-track">{items+items}</div></div>'
+
+# Reruns on its own every TAPE_RENDER_INTERVAL seconds from the streaming
+# tape, without rerunning the rest of the page. The HTML is rebuilt only when
+# the tape's seq (or, without a tape, the snapshot) moved since this session
+# last drew it; otherwise the same markup is re-emitted, which the browser
+# diffs away (a fragment rerun drops any element it doesn't draw again).
+@st.fragment(run_every=TAPE_RENDER_INTERVAL)
+def ticker_tape():
+    tape = getattr(hub(), "tape", None)
+    live = tape is not None and bool(tape.rows)
+    snap_now = None if live else hub().get()
+    key = ("tape", tape.seq) if live else ("snapshot", snap_now.built)
+    drawn = st.session_state.get("tape_drawn")
+    if drawn is None or drawn[0] != key:
+        q = tape.frame() if live else snap_now.quotes
+        drawn = st.session_state.tape_drawn = (key, tape_html(q) if not q.empty else "")
+    if drawn[1]:
+        st.markdown(drawn[1], unsafe_allow_html=True)
+
+ticker_tape()
 
 
 # ── NOTE DU TRADER ───────────────────────────────────────────
@@ -344,8 +396,7 @@ if st.session_state.show_quotes and not quotes.empty:
 # ── NEWS ─────────────────────────────────────────────────────
 if st.session_state.show_news:
     st.markdown('<div class="sec-header">NEWS FEED</div>', unsafe_allow_html=True)
-    with st.spinner(""):
-        news = load_news()
+    news = snap.news
     if not news.empty:
         cols = st.columns(2)
         for i, (_, r) in enumerate(news.iterrows()):
@@ -360,23 +411,32 @@ if st.session_state.show_charts:
         ("EQUITY & VOLATILITY","equity"), ("INTEREST RATES","rates"),
         ("YIELD CURVE","curve"), ("INFLATION & MACRO","macro"),
         ("CREDIT MARKETS","credit"), ("COMMODITIES","commo"),
-        ("STOCK-BOND CORRELATION","corr"),
+        ("STOCK-BOND CORRELATION","corr"), ("CROSS-ASSET CORRELATION","xcorr"),
     ]:
+        if key == "xcorr" and not snap.corr:
+            continue
         st.markdown(f'<div class="sec-header">{section}</div>', unsafe_allow_html=True)
         st.markdown('<div class="chart-wrap">', unsafe_allow_html=True)
         if key == "equity":
             c1,c2 = st.columns([2,1])
-            with c1: st.plotly_chart(apply_style(chart_sp500(df)), use_container_width=True)
-            with c2: st.plotly_chart(apply_style(chart_vix(df)),   use_container_width=True)
-        elif key == "rates":  st.plotly_chart(apply_style(chart_rates(df)),       use_container_width=True)
-        elif key == "curve":  st.plotly_chart(apply_style(chart_curve(df)),       use_container_width=True)
+            with c1: show_chart("sp500", width=1050)
+            with c2: show_chart("vix", width=530)
+        elif key == "rates":  show_chart("rates")
+        elif key == "curve":  show_chart("curve")
         elif key == "macro":
             c1,c2 = st.columns(2)
-            with c1: st.plotly_chart(apply_style(chart_inflation(df)),    use_container_width=True)
-            with c2: st.plotly_chart(apply_style(chart_unemployment(df)), use_container_width=True)
-        elif key == "credit": st.plotly_chart(apply_style(chart_credit(df)),      use_container_width=True)
-        elif key == "commo":  st.plotly_chart(apply_style(chart_commodities(df)), use_container_width=True)
-        elif key == "corr":   st.plotly_chart(apply_style(chart_correlation(df)), use_container_width=True)
+            with c1: show_chart("inflation", width=800)
+            with c2: show_chart("unemployment", width=800)
+        elif key == "credit": show_chart("credit")
+        elif key == "commo":  show_chart("commodities")
+        elif key == "corr":   show_chart("correlation")
+        elif key == "xcorr":
+            # daily snapshots of the rolling matrix, FRED series + tickers
+            dates = list(snap.corr)
+            d = dates[-1] if len(dates) == 1 else st.select_slider(
+                "Date", dates, value=dates[-1], format_func=lambda t: t.strftime("%Y-%m-%d"), key="corr_date")
+            with span("app.render.corr_matrix"):
+                st.plotly_chart(chart_corr_matrix(snap.corr[d]), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
 
@@ -384,19 +444,64 @@ if st.session_state.show_charts:
 st.markdown('<div class="sec-header">DAILY REPORT</div>', unsafe_allow_html=True)
 st.markdown("<div style='padding:0 24px'>", unsafe_allow_html=True)
 if st.button("Generate PDF Report"):
-    with st.spinner("Generating..."):
-        pdf_bytes = generate_pdf(last, quotes, load_news(), engine.alerts, score, risk_label)
-    st.download_button("Download PDF", data=pdf_bytes,
+    st.session_state.report_key = REPORTS.submit(last, quotes, snap.news, engine.alerts, score, risk_label)
+
+# Polls the background job every REPORT_POLL_INTERVAL seconds without
+# rerunning the page, and only while it is rendering: once it finishes, one
+# full rerun draws the result below and the poller is no longer called.
+@st.fragment(run_every=REPORT_POLL_INTERVAL)
+def report_poll(key):
+    if REPORTS.status(key) == "running":
+        st.caption("Generating...")
+    else:
+        st.rerun()
+
+report_job = st.session_state.get("report_key")
+report_state = REPORTS.status(report_job) if report_job else None
+if report_state == "running":
+    report_poll(report_job)
+elif report_state == "done":
+    st.download_button("Download PDF", data=REPORTS.result(report_job),
         file_name="mkttrk_" + datetime.now().strftime("%Y%m%d") + ".pdf",
         mime="application/pdf")
+elif report_state is not None:
+    st.caption("Report unavailable — generate it again.")
 st.markdown("</div>", unsafe_allow_html=True)
 
 
-# ── RAW DATA ─────────────────────────────────────────────────
+# ── ROLLING ANALYTICS ────────────────────────────────────────
 st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
+with st.expander("ROLLING ANALYTICS"):
+    w = st.radio("Fenêtre", ANALYTICS_WINDOWS, index=ANALYTICS_WINDOWS.index(ROLLING_RETURN_WINDOW),
+                 format_func=lambda n: str(n) + "J", horizontal=True, key="analytics_window")
+    table = ANALYTICS.latest(snap.frame, snap.version, w)
+    table.index = [SERIES[s]["label"] for s in table.index]
+    st.dataframe(table.style.format("{:.2f}", na_rep=""), use_container_width=True)
+    st.caption("Ret / DD en % (en points pour taux, courbes et spreads) · Vol annualisée · Z = niveau vs moyenne sur la fenêtre")
+
+
+# ── RAW DATA ─────────────────────────────────────────────────
 with st.expander("RAW DATA"):
     display_cols = [c for c in ["SP500","VIX","Bond_2Y","Bond_10Y","Fed_Rate","Curve_10_2","Curve_10_3m","CPI_YoY","Core_PCE_YoY","Unemployment","HY_Spread","Oil_WTI","Gold","Stock_Bond_Corr"] if c in df.columns]
     st.dataframe(df[display_cols].tail(30).style.format("{:.2f}"), use_container_width=True)
     st.download_button("Export CSV", df[display_cols].to_csv(), "mkttrk_" + datetime.now().strftime("%Y%m%d") + ".csv", "text/csv")
 
+
+# ── DIAGNOSTICS ──────────────────────────────────────────────
+with st.expander("DIAGNOSTICS"):
+    # Spans recorded in this process (background refreshes included). With
+    # SERVICE_URL set, fetch/enrich timings live in the service: see its /metrics.
+    rows = METRICS.table()
+    if rows:
+        diag = pd.DataFrame(rows).set_index("span")
+        diag[["total", "mean", "last", "max"]] *= 1000
+        st.dataframe(diag[["count", "last", "mean", "max", "total", "hits", "misses", "hit_rate", "errors"]]
+                     .rename(columns={"last": "last ms", "mean": "mean ms", "max": "max ms", "total": "total ms"})
+                     .style.format({"last ms": "{:.1f}", "mean ms": "{:.1f}", "max ms": "{:.1f}",
+                                    "total ms": "{:.0f}", "hit_rate": "{:.0%}"}, na_rep=""),
+                     use_container_width=True)
+    dc = st.columns([1, 1, 6])
+    with dc[0]: st.download_button("Export JSON", json.dumps(METRICS.to_json()), "mkttrk_metrics.json", "application/json")
+    with dc[1]: st.download_button("Export Prometheus", METRICS.to_prometheus(), "mkttrk_metrics.prom", "text/plain")
+
 st.markdown("<div style='height:40px'></div>", unsafe_allow_html=True)
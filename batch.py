@@ -0,0 +1,179 @@
+# batch.py — render many report variants from one data load
+#   python batch.py variants.json                 -> reports/YYYYMMDD/*.pdf + manifest.json
+#   python batch.py variants.json --workers 8 --out /srv/reports --source replay
+# The FRED frame, quotes and news are loaded once in this process; only the
+# last row, the quotes and the news page are shipped to each worker (once, by
+# the pool initializer), so the run costs one fetch plus N renders spread over
+# the cores.
+#
+# variants.json is a list of
+#   {"name": "rates-desk",
+#    "tickers": ["TLT", "GLD"],                  optional, default YFINANCE_TICKERS
+#    "alerts": {"Curve_10_2": {}, "VIX": {"red": 30, "yellow": 20}}}
+# "alerts" keeps only the listed ALERTS keys, each with its overrides applied
+# (an empty dict keeps the default rule); omitted = every default rule.
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from alerts import AlertEngine, compile_rules
+from config import ALERTS, YFINANCE_TICKERS, STORE_DIR, SOURCE_MODE, BATCH_DIR, BATCH_WORKERS
+from data import MarketData
+from live import LiveData, NewsFeed
+from report import generate_pdf, report_key
+from snapshot import NEWS_PAGE_SIZE
+from sources import Faults, fred_client, yf_client, news_client
+from store import SeriesStore
+
+DEFAULT_VARIANTS = [{"name": "market"}]
+
+
+def variant_file(name):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name) + ".pdf"
+
+
+def load_variants(path):
+    if path is None:
+        return DEFAULT_VARIANTS
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_variants(variants):
+    # Names are compared after sanitizing, so "a desk" and "a_desk" can't
+    # silently overwrite each other's PDF.
+    files = {}
+    for v in variants:
+        f = variant_file(v["name"])
+        if f in files:
+            raise ValueError("variants " + repr(files[f]) + " and " + repr(v["name"]) + " both write " + f)
+        files[f] = v["name"]
+
+
+def variant_rules(variant):
+    # ALERTS subset + per-key overrides -> config dict for compile_rules
+    spec = variant.get("alerts")
+    if spec is None:
+        return ALERTS
+    cfg = {}
+    for key, overrides in spec.items():
+        if key not in ALERTS:
+            print("[WARN] " + variant["name"] + ": unknown alert " + key + ", skipped")
+            continue
+        cfg[key] = {**ALERTS[key], **overrides}
+    return cfg
+
+
+def variant_tickers(variant):
+    tickers = variant.get("tickers")
+    if tickers is None:
+        return list(YFINANCE_TICKERS)
+    unknown = [t for t in tickers if t not in YFINANCE_TICKERS]
+    if unknown:
+        print("[WARN] " + variant["name"] + ": tickers not in YFINANCE_TICKERS: " + ", ".join(unknown))
+    return tickers
+
+
+def load_inputs(source=SOURCE_MODE, store=STORE_DIR, tickers=None):
+    # One load for the whole batch: incremental FRED refresh from the store,
+    # one quote download for the union of every variant's tickers, one news poll.
+    faults = Faults()
+    market = MarketData(fred=fred_client(source, faults=faults), store=SeriesStore(store))
+    market.load()
+    live = LiveData(tickers={t: YFINANCE_TICKERS.get(t, t) for t in tickers or YFINANCE_TICKERS},
+                    yf=yf_client(source, faults=faults), newsapi=news_client(source, faults=faults))
+    live.news = NewsFeed(live.newsapi, path=os.path.join(store, "news.json"))
+    return market, live.get_quotes(), live.news.refresh(NEWS_PAGE_SIZE)
+
+
+# ── WORKERS ─────────────────────────────────────────────────
+_shared = {}
+
+def _init_worker(last, quotes, news, out):
+    _shared.update(last=last, quotes=quotes, news=news, out=out)
+
+
+def render_variant(variant):
+    t0 = time.perf_counter()
+    last, quotes, news = _shared["last"], _shared["quotes"], _shared["news"]
+    if not quotes.empty:
+        quotes = quotes[quotes["Ticker"].isin(variant["tickers"])].reset_index(drop=True)
+    engine = AlertEngine(last, compile_rules(variant["alerts"]))
+    score = engine.risk_score()
+    risk_label, _ = engine.risk_label()
+    pdf = generate_pdf(last, quotes, news, engine.alerts, score, risk_label)
+    name = variant_file(variant["name"])
+    path = os.path.join(_shared["out"], name)
+    with open(path + ".tmp", "wb") as f:
+        f.write(pdf)
+    os.replace(path + ".tmp", path)
+    return {
+        "name": variant["name"], "file": name, "bytes": len(pdf),
+        "key": report_key(last, quotes, news, engine.alerts, score, risk_label),
+        "tickers": len(quotes), "alerts": len(engine.alerts),
+        "score": score, "risk": risk_label,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def run_batch(variants, out, workers=BATCH_WORKERS, source=SOURCE_MODE, store=STORE_DIR):
+    check_variants(variants)
+    if not variants:
+        print("[WARN] No report variants to render")
+        return {"generated": datetime.now().isoformat(timespec="seconds"), "source": source,
+                "workers": 0, "load_seconds": 0.0, "render_seconds": 0.0, "reports": [], "errors": []}
+    os.makedirs(out, exist_ok=True)
+    jobs = [{"name": v["name"], "tickers": variant_tickers(v), "alerts": variant_rules(v)}
+            for v in variants]
+    t0 = time.perf_counter()
+    market, quotes, news = load_inputs(source, store, sorted({t for j in jobs for t in j["tickers"]}))
+    last = market.last_values()
+    loaded = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    reports, errors = [], []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker,
+                             initargs=(last, quotes, news, out)) as pool:
+        futures = {pool.submit(render_variant, j): j["name"] for j in jobs}
+        for fut in as_completed(futures):
+            try:
+                reports.append(fut.result())
+            except Exception as e:
+                print("Error rendering " + futures[fut] + ": " + str(e))
+                errors.append({"name": futures[fut], "error": str(e)})
+    order = {j["name"]: i for i, j in enumerate(jobs)}
+    reports.sort(key=lambda r: order[r["name"]])
+
+    manifest = {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "data_date": str(last.name.date()),
+        "data_version": market.version,
+        "source": source,
+        "workers": workers,
+        "load_seconds": round(loaded, 3),
+        "render_seconds": round(time.perf_counter() - t1, 3),
+        "reports": reports,
+        "errors": errors,
+    }
+    with open(os.path.join(out, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MKTTRK batch report rendering")
+    parser.add_argument("variants", nargs="?", help="JSON list of report variants (default: one full report)")
+    parser.add_argument("--out", default=None, help="output directory (default BATCH_DIR/YYYYMMDD)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="render processes (0 = all cores)")
+    parser.add_argument("--source", choices=["live", "record", "replay"], default=SOURCE_MODE)
+    parser.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args()
+    out = args.out or os.path.join(BATCH_DIR, datetime.now().strftime("%Y%m%d"))
+    m = run_batch(load_variants(args.variants), out, args.workers, args.source, args.store)
+    print("Rendered " + str(len(m["reports"])) + " reports (" + str(len(m["errors"])) + " failed) into "
+          + out + " · load " + str(m["load_seconds"]) + "s, render " + str(m["render_seconds"]) + "s")
@@ -0,0 +1,332 @@
+# bench.py — offline benchmarks (no network)
+#   python bench.py                      fetch + store + pipeline
+#   python bench.py pipeline --years 1 10 50 --series 16 64 --tickers 10 100
+#   python bench.py pipeline --save      record the results as the baseline
+#   python bench.py pipeline --check     exit 1 if anything regressed vs the baseline
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+import numpy as np
+import pandas as pd
+
+import charts
+from alerts import AlertEngine
+from analytics import RollingCorrelation, daily_changes
+from compact import CompactFrame
+from config import SERIES, START_DATE, YFINANCE_TICKERS, ROLLING_CORR_WINDOW, CORR_SNAPSHOTS
+from data import MarketData, fetch_series
+from live import HistoryCache, LiveData
+from report import generate_pdf
+from store import SeriesStore
+
+BASELINE = "bench_baseline.json"
+MONTHLY_IDS = {"FEDFUNDS", "CPIAUCSL", "PCEPILFE", "UNRATE"}
+
+
+# ── FAKE FRED ───────────────────────────────────────────────
+class FakeFred:
+    def __init__(self, latency=(0.05, 0.4), fail_rate=0.0, hang=(), hang_for=5.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.hang = set(hang)
+        self.hang_for = hang_for
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.rows = 0
+        self.today = pd.Timestamp.today().normalize()
+
+    def get_series(self, series_id, observation_start=None, **kwargs):
+        self.calls += 1
+        lo, hi = self.latency
+        delay = self.rng.uniform(lo, hi)
+        fail = self.rng.random() < self.fail_rate
+        time.sleep(self.hang_for if series_id in self.hang else delay)
+        if fail:
+            raise ValueError("injected failure for " + series_id)
+        idx = pd.bdate_range(observation_start or START_DATE, self.today)
+        self.rows += len(idx)
+        return pd.Series(range(len(idx)), index=idx, dtype=float) + 100.0
+
+    def get_series_info(self, series_id):
+        return pd.Series({"id": series_id, "frequency_short": "D"})
+
+
+def bench_fetch():
+    print("── MarketData.load: serial vs concurrent ──")
+    for workers in [1, 4, 8, 16]:
+        fred = FakeFred(latency=(0.05, 0.4))
+        t0 = time.perf_counter()
+        md = MarketData(fred=fred, workers=workers, store=SeriesStore(tempfile.mkdtemp()))
+        md.load()
+        dt = time.perf_counter() - t0
+        print(f"workers={workers:<3} series={len(SERIES)}  wall={dt:6.2f}s  rows={len(md.df)}")
+
+    fred = FakeFred(latency=(0.05, 0.2), fail_rate=0.3, hang={"GOLD"}, seed=1)
+    requests = {key: (meta["id"], START_DATE) for key, meta in SERIES.items()}
+    t0 = time.perf_counter()
+    frames, errors = fetch_series(fred, requests, workers=8, timeout=1.0, retries=2, backoff=0.1)
+    dt = time.perf_counter() - t0
+    print(f"flaky+hang  wall={dt:6.2f}s  calls={fred.calls}  ok={len(frames)}  failed={errors}")
+
+
+def bench_store():
+    print("── MarketData.load: cold vs incremental vs disk-only ──")
+    root = tempfile.mkdtemp()
+    fred = FakeFred(latency=(0.05, 0.1))
+    fred.today = pd.Timestamp.today().normalize() - pd.Timedelta(days=3)
+    for label, fetch in [("cold", True), ("incremental", True), ("disk-only", False)]:
+        if label == "incremental":
+            fred.today += pd.Timedelta(days=3)
+        fred.rows = 0
+        t0 = time.perf_counter()
+        df = MarketData(fred=fred, store=SeriesStore(root)).load(fetch=fetch)
+        dt = time.perf_counter() - t0
+        print(f"{label:<12} wall={dt:6.3f}s  rows fetched={fred.rows:<6} rows={len(df)}")
+
+
+# ── SYNTHETIC FIXTURES ──────────────────────────────────────
+class SynthFred:
+    # Random-walk FRED series over the last `years`, deterministic and instant:
+    # each series is generated once and then served by slicing, like a recording.
+    # Monthly ids get month-start observations like the real API.
+    def __init__(self, years, seed=0):
+        self.end = pd.Timestamp.today().normalize()
+        self.start = self.end - pd.DateOffset(years=years)
+        self.seed = seed
+        self.recorded = {}
+
+    def record(self, series_id):
+        if series_id not in self.recorded:
+            if series_id in MONTHLY_IDS:
+                idx = pd.date_range(self.start, self.end, freq="MS")
+            else:
+                idx = pd.date_range(self.start, self.end, freq="D")
+                idx = idx[idx.dayofweek < 5]
+            rng = np.random.default_rng([zlib.crc32(series_id.encode()), self.seed])
+            walk = np.cumsum(rng.normal(0, 0.01, len(idx)))
+            self.recorded[series_id] = pd.Series(100.0 * np.exp(walk) if series_id == "SP500" else 3.0 + walk,
+                                                 index=idx)
+        return self.recorded[series_id]
+
+    def get_series(self, series_id, observation_start=None, **kwargs):
+        s = self.record(series_id)
+        return s.iloc[s.index.searchsorted(pd.Timestamp(observation_start or self.start)):]
+
+    def get_series_info(self, series_id):
+        return pd.Series({"id": series_id, "frequency_short": "M" if series_id in MONTHLY_IDS else "D"})
+
+
+class SynthYF:
+    # Stand-in for the yfinance module: download() and Ticker().history().
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def _bars(self, ticker, days):
+        idx = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days)
+        rng = np.random.default_rng([zlib.crc32(ticker.encode()), self.seed])
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99,
+                             "Close": close, "Volume": 1e6}, index=idx)
+
+    def download(self, tickers, period="5d", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else tickers
+        return pd.concat({t: self._bars(t, 5) for t in tickers}, axis=1)
+
+    def Ticker(self, ticker):
+        bars = self._bars
+        class _Ticker:
+            def history(self, period="1y", **kwargs):
+                return bars(ticker, 252 * 5)
+        return _Ticker()
+
+
+def synth_series(n):
+    # The first n configured series (SP500 always included), padded with
+    # synthetic daily series when n exceeds the config.
+    keys = list(SERIES)[:max(1, n)]
+    series = {k: SERIES[k] for k in keys}
+    for i in range(len(series), n):
+        series["X%03d" % i] = {"id": "SYN%03d" % i, "label": "Synthetic " + str(i), "category": "Synthetic"}
+    return series
+
+def synth_tickers(n):
+    tickers = dict(list(YFINANCE_TICKERS.items())[:n])
+    for i in range(len(tickers), n):
+        tickers["T%03d" % i] = "Synthetic " + str(i)
+    return tickers
+
+def synth_news(n=12):
+    now = pd.Timestamp.now(tz="UTC")
+    return pd.DataFrame([{
+        "title": "Synthetic headline number " + str(i) + " about rates, inflation and equities",
+        "source": "Wire", "url": "https://example.com/" + str(i),
+        "publishedAt": (now - pd.Timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "description": "",
+    } for i in range(n)])
+
+
+# ── PIPELINE ────────────────────────────────────────────────
+def measure(fn, repeat=3):
+    # Peak traced memory from one run, best wall time of `repeat` untraced runs.
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, {"wall": best, "peak": peak}
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _corr_engine(changes):
+    corr = RollingCorrelation()
+    corr.update(changes)
+    return corr
+
+
+def bench_fixture(years, n_series, n_tickers, repeat=3):
+    # -> {stage: {"wall", "peak", "payload"}} for one fixture
+    results = {}
+    fred = SynthFred(years)
+    series = synth_series(n_series)
+    start = fred.start.strftime("%Y-%m-%d")
+    for meta in series.values():
+        fred.record(meta["id"])
+
+    def load():
+        return MarketData(fred=fred, store=SeriesStore(tempfile.mkdtemp()), series=series, start=start).load()
+    frame, results["load"] = measure(load, repeat)
+    results["load"]["payload"] = frame.nbytes
+
+    root = tempfile.mkdtemp()
+    MarketData(fred=fred, store=SeriesStore(root), series=series, start=start).load()
+    frame, results["load (disk)"] = measure(
+        lambda: MarketData(fred=fred, store=SeriesStore(root), series=series, start=start).load(fetch=False), repeat)
+    results["load (disk)"]["payload"] = frame.nbytes
+    df, results["materialize"] = measure(frame.frame, repeat)
+    results["materialize"]["payload"] = _frame_bytes(df)
+
+    yf = SynthYF()
+    tickers = synth_tickers(n_tickers)
+    quotes, results["get_quotes"] = measure(
+        lambda: LiveData(history=HistoryCache(yf=yf), tickers=tickers, yf=yf).get_quotes(), repeat)
+    results["get_quotes"]["payload"] = _frame_bytes(quotes)
+
+    engine, results["alerts"] = measure(lambda: AlertEngine(df.iloc[-1]), repeat)
+    results["alerts"]["payload"] = len(engine.alerts)
+    _, results["alerts (frame)"] = measure(lambda: AlertEngine.evaluate_frame(df), repeat)
+    results["alerts (frame)"]["payload"] = len(df)
+
+    for name in sorted(n for n in dir(charts) if n.startswith("chart_") and n != "chart_corr_matrix"):
+        fn = getattr(charts, name)
+        payload, results[name] = measure(lambda: fn(df).to_json(), repeat)
+        results[name]["payload"] = len(payload)
+
+    # cross-asset matrix: FRED series + ticker closes, backfilled then heatmapped
+    closes = pd.DataFrame({t: yf.Ticker(t).history(period="1y")["Close"] for t in tickers})
+    closes.index = closes.index.normalize()
+    compact = CompactFrame.from_frame(df)
+    changes = daily_changes(compact, closes, start=max(len(df) - ROLLING_CORR_WINDOW - CORR_SNAPSHOTS, 0))
+    corr, results["corr_update"] = measure(lambda: _corr_engine(changes), repeat)
+    results["corr_update"]["payload"] = len(corr.names)
+    payload, results["chart_corr_matrix"] = measure(lambda: charts.chart_corr_matrix(corr.matrix()).to_json(), repeat)
+    results["chart_corr_matrix"]["payload"] = len(payload)
+
+    news = synth_news()
+    label, _ = engine.risk_label()
+    pdf, results["generate_pdf"] = measure(
+        lambda: generate_pdf(df.iloc[-1], quotes, news, engine.alerts, engine.risk_score(), label), repeat)
+    results["generate_pdf"]["payload"] = len(pdf)
+    return results
+
+
+def _fmt_bytes(n):
+    for unit in ["B", "KB", "MB"]:
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+def compare(current, baseline, tolerance):
+    # -> list of regression strings; wall and peak may grow by `tolerance`
+    # (relative), payloads by half of it.
+    regressions = []
+    for key, row in current.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, tol in [("wall", tolerance), ("peak", tolerance), ("payload", tolerance / 2)]:
+            if base.get(metric) and row[metric] > base[metric] * (1 + tol):
+                regressions.append(f"{key} {metric}: {base[metric]:.4g} -> {row[metric]:.4g}")
+    return regressions
+
+def bench_pipeline(years=(1, 10, 50), series=(len(SERIES),), tickers=(len(YFINANCE_TICKERS),),
+                   repeat=3, baseline=BASELINE, save=False, tolerance=0.25):
+    print("── Pipeline: load → quotes → alerts → charts → pdf ──")
+    previous = {}
+    if os.path.exists(baseline):
+        with open(baseline) as f:
+            previous = json.load(f)["results"]
+    current = {}
+    for y in years:
+        for n_series in series:
+            for n_tickers in tickers:
+                fixture = f"y={y} s={n_series} t={n_tickers}"
+                print(fixture)
+                for stage, row in bench_fixture(y, n_series, n_tickers, repeat).items():
+                    key = fixture + " " + stage
+                    current[key] = row
+                    base = previous.get(key)
+                    delta = f"{(row['wall'] / base['wall'] - 1) * 100:+6.1f}%" if base and base["wall"] else ""
+                    print(f"  {stage:<20} wall={row['wall'] * 1000:9.2f}ms {delta:>8}  "
+                          f"peak={_fmt_bytes(row['peak']):>8}  payload={row['payload']}")
+    regressions = compare(current, previous, tolerance)
+    for r in regressions:
+        print("[REGRESSION] " + r)
+    if save:
+        with open(baseline, "w") as f:
+            json.dump({"saved": time.strftime("%Y-%m-%d %H:%M"), "python": sys.version.split()[0],
+                       "results": current}, f, indent=1, sort_keys=True)
+        print("Baseline saved to " + baseline)
+    return current, regressions
+
+
+SUITES = ["fetch", "store", "pipeline"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MKTTRK offline benchmarks")
+    # no choices= here: with nargs="*" argparse checks the empty default against them
+    parser.add_argument("suite", nargs="*", help="fetch, store and/or pipeline (default: all)")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--series", type=int, nargs="+", default=[len(SERIES)])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[len(YFINANCE_TICKERS)])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on any regression vs the baseline")
+    args = parser.parse_args()
+    args.suite = args.suite or SUITES
+    for suite in args.suite:
+        if suite not in SUITES:
+            parser.error("unknown suite " + repr(suite) + " (choose from " + ", ".join(SUITES) + ")")
+    if "fetch" in args.suite:
+        bench_fetch()
+    if "store" in args.suite:
+        bench_store()
+    if "pipeline" in args.suite:
+        _, regressions = bench_pipeline(args.years, args.series, args.tickers, args.repeat,
+                                        args.baseline, args.save, args.tolerance)
+        if args.check and regressions:
+            sys.exit(1)
@@ -0,0 +1,124 @@
+# compact.py — compact column store for the enriched market frame
+# Every column lives on one shared daily grid (a DatetimeIndex) but is stored
+# in its cheapest form:
+#   runs   (starts, values): one entry per change of value. A forward-filled
+#          monthly series keeps ~1 value a month, i.e. its native frequency.
+#   dense  values only, for columns that change on most rows (daily prices).
+# Values are float32 when the column is published at a fixed number of
+# decimals (<= FLOAT32_MAX_DECIMALS) that rounding the float32 back to float64
+# recovers exactly; they are rounded on read, so readers (CSV export, service
+# JSON, alerts) get the published values. Other columns (returns,
+# correlations) stay float64. Nothing is aligned to the daily grid until it is read:
+# frame()/column()/row() expand just the rows asked for, by searchsorted
+# position maps into the runs.
+import hashlib
+import numpy as np
+import pandas as pd
+
+FLOAT32_MAX_DECIMALS = 4   # FRED publishes at most 4 decimals (DTWEXBGS)
+RUNS_MAX_SHARE = 0.3    # use runs when there are fewer than this many changes per row
+
+
+def _decimals(v):
+    # Fewest decimals (<= FLOAT32_MAX_DECIMALS) every finite value is exact at, or None
+    finite = v[np.isfinite(v)]
+    for d in range(FLOAT32_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(finite, d), finite):
+            return d
+    return None
+
+
+def _encode(v):
+    # -> (starts or None, values, decimals or None); the dtype is settled first
+    # so that runs are found on the stored values (a frame re-encoded from its
+    # own output is encoded identically). decimals is set only for float32.
+    d = _decimals(v)
+    if d is not None:
+        v32 = v.astype("float32")
+        finite = np.isfinite(v)
+        if np.array_equal(np.round(v32[finite].astype("float64"), d), v[finite]):
+            v = v32
+        else:
+            d = None
+    same = (v[1:] == v[:-1]) | (np.isnan(v[1:]) & np.isnan(v[:-1]))
+    starts = np.concatenate([[0], np.flatnonzero(~same) + 1]).astype("int32")
+    if len(starts) < len(v) * RUNS_MAX_SHARE:
+        return starts, v[starts], d
+    return None, v, d
+
+
+def _widen(values, d):
+    # stored values -> float64, float32 ones rounded back to their published decimals
+    out = values.astype("float64")
+    return out if d is None else np.round(out, d)
+
+
+class CompactFrame:
+    def __init__(self, index, columns, decimals=None):
+        self.index = index              # DatetimeIndex: the daily grid
+        self.data = columns             # name -> (starts int32 | None, values float32/64)
+        self.decimals = decimals or {}  # name -> decimals float32 values are rounded to on read
+
+    @classmethod
+    def from_frame(cls, df):
+        cols, decimals = {}, {}
+        for c in df.columns:
+            starts, values, d = _encode(df[c].to_numpy(dtype="float64"))
+            cols[c] = (starts, values)
+            if d is not None:
+                decimals[c] = d
+        return cls(pd.DatetimeIndex(df.index), cols, decimals)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def columns(self):
+        return list(self.data)
+
+    @property
+    def empty(self):
+        return len(self.index) == 0
+
+    @property
+    def nbytes(self):
+        n = self.index.nbytes
+        for starts, values in self.data.values():
+            n += values.nbytes + (starts.nbytes if starts is not None else 0)
+        return n
+
+    def column(self, name, start=0, stop=None):
+        # float64 values of one column on grid rows [start, stop)
+        stop = len(self.index) if stop is None else stop
+        starts, values = self.data[name]
+        d = self.decimals.get(name)
+        if starts is None:
+            return _widen(values[start:stop], d)
+        pos = np.searchsorted(starts, np.arange(start, stop), side="right") - 1
+        return _widen(values[pos], d)
+
+    def frame(self, start=0, stop=None, columns=None):
+        # Materialize grid rows [start, stop) as a regular float64 DataFrame.
+        stop = len(self.index) if stop is None else stop
+        columns = self.columns if columns is None else [c for c in columns if c in self.data]
+        return pd.DataFrame({c: self.column(c, start, stop) for c in columns},
+                            index=self.index[start:stop], columns=columns)
+
+    def row(self, pos=-1):
+        pos = pos % len(self.index)
+        out = {}
+        for name, (starts, values) in self.data.items():
+            i = pos if starts is None else np.searchsorted(starts, pos, side="right") - 1
+            out[name] = float(_widen(values[i:i + 1], self.decimals.get(name))[0])
+        return pd.Series(out, name=self.index[pos], dtype="float64")
+
+    def version(self):
+        # Short content hash; changes whenever any date, value or column does.
+        h = hashlib.sha1(self.index.asi8.tobytes())
+        for name, (starts, values) in self.data.items():
+            h.update(name.encode())
+            if starts is not None:
+                h.update(starts.tobytes())
+            h.update(values.tobytes())
+            h.update(str(self.decimals.get(name)).encode())
+        return h.hexdigest()[:12]
@@ -22,6 +22,18 @@ SERIES = {
     "Gold":         {"id": "GOLD",         "label": "Gold ($/oz)",        "category": "Commodities"},
 }
 
+# Rolling windows (trading days) used by data.enrich and analytics.py
+ROLLING_CORR_WINDOW = 30       # Stock_Bond_Corr
+ROLLING_RETURN_WINDOW = 20     # SP500_<n>D_Ret, watched by the "SP500" alert
+ANALYTICS_WINDOWS = [5, ROLLING_RETURN_WINDOW, 60, 252]
+ANALYTICS_PERIODS_PER_YEAR = 252
+
+# Cross-asset correlation matrix (see analytics.RollingCorrelation)
+CORR_MIN_PERIODS = 20          # overlapping days needed for a pair's correlation
+CORR_SNAPSHOTS = 20            # daily matrices kept for the heatmap
+CORR_RESYNC = 250              # days between exact rebuilds of the running sums
+CORR_HISTORY_PERIOD = "6mo"    # ticker history loaded to seed the window
+
 # yfinance tickers
 YFINANCE_TICKERS = {
     "SPY":  "S&P 500 ETF",
@@ -36,12 +48,126 @@ YFINANCE_TICKERS = {
     "TSLA": "Tesla",
 }
 
+# Alert rules (compiled once by alerts.compile_rules). "above" rules go RED when
+# the column is greater than "red" and YELLOW when greater than "yellow";
+# "below" rules mirror that. Messages are str.format templates over {label} and {value}, the
+# value rounded to "decimals", plus {red} and {yellow}, the rule's thresholds (so overrides,
+# e.g. per batch.py variant, show the levels actually applied).
 ALERTS = {
-    "VIX":         {"high": 25,  "low": 15,  "label": "VIX"},
-    "Curve_10_2":  {"inversion": 0,           "label": "10Y-2Y Curve"},
-    "Curve_10_3m": {"inversion": 0,           "label": "10Y-3M Curve"},
-    "HY_Spread":   {"high": 500, "low": 300,  "label": "HY Spread (bps)"},
+    "VIX": {
+        "column": "VIX", "label": "VIX", "direction": "above", "red": 25, "yellow": 15,
+        "decimals": 1,
+        "messages": {
+            "RED":    "VIX a {value} - marches stresses (>{red})",
+            "YELLOW": "VIX a {value} - volatilite moderee ({yellow}-{red})",
+            "GREEN":  "VIX a {value} - marches calmes (<{yellow})",
+        },
+    },
+    "Curve_10_2": {
+        "column": "Curve_10_2", "label": "10Y-2Y Curve", "direction": "below", "red": 0, "yellow": 0.25,
+        "decimals": 2,
+        "messages": {
+            "RED":    "{label} inversee a {value}% - risque recession",
+            "YELLOW": "{label} quasi-plate a {value}%",
+            "GREEN":  "{label} normale a {value}%",
+        },
+    },
+    "Curve_10_3m": {
+        "column": "Curve_10_3m", "label": "10Y-3M Curve", "direction": "below", "red": 0, "yellow": 0.25,
+        "decimals": 2,
+        "messages": {
+            "RED":    "{label} inversee a {value}% - risque recession",
+            "YELLOW": "{label} quasi-plate a {value}%",
+            "GREEN":  "{label} normale a {value}%",
+        },
+    },
+    "HY_Spread": {
+        # FRED quotes the spread in %, so 500/300 bps become 5.0/3.0
+        "column": "HY_Spread", "label": "HY Spread (bps)", "direction": "above", "red": 5.0, "yellow": 3.0,
+        "decimals": 2,
+        "messages": {
+            "RED":    "HY Spread a {value}% - stress credit eleve",
+            "YELLOW": "HY Spread a {value}% - credit moderement large",
+            "GREEN":  "HY Spread a {value}% - credit sain",
+        },
+    },
+    "CPI": {
+        "column": "CPI_YoY", "label": "CPI YoY", "direction": "above", "red": 4.0, "yellow": 2.5,
+        "decimals": 1,
+        "messages": {
+            "RED":    "CPI a {value}% - inflation bien au-dessus de la cible",
+            "YELLOW": "CPI a {value}% - inflation legerement au-dessus",
+            "GREEN":  "CPI a {value}% - inflation proche de la cible",
+        },
+    },
+    "SP500": {
+        "column": "SP500_" + str(ROLLING_RETURN_WINDOW) + "D_Ret",
+        "label": "S&P 500 (" + str(ROLLING_RETURN_WINDOW) + "J)", "direction": "below", "red": -10, "yellow": -5,
+        "decimals": 1,
+        "messages": {
+            "RED":    "S&P 500 en baisse de {value}% sur " + str(ROLLING_RETURN_WINDOW) + "j - forte correction",
+            "YELLOW": "S&P 500 en baisse de {value}% sur " + str(ROLLING_RETURN_WINDOW) + "j - correction moderee",
+            "GREEN":  "S&P 500 a {value}% sur " + str(ROLLING_RETURN_WINDOW) + "j - stable",
+        },
+    },
 }
 
-ROLLING_CORR_WINDOW = 30
-ROLLING_RETURN_WINDOW = 20
+# Dashboard lookback buttons -> calendar days
+LOOKBACK_DAYS = {"6M": 180, "1Y": 365, "2Y": 730, "3Y": 1095, "ALL": 9999}
+
+# FRED fetch engine
+FETCH_WORKERS = 8       # max concurrent FRED requests
+FETCH_TIMEOUT = 20      # seconds per attempt
+FETCH_RETRIES = 2       # extra attempts after the first failure
+FETCH_BACKOFF = 0.5     # seconds, doubled after each failed attempt
+
+# Local series store (see store.py)
+STORE_DIR = ".mkttrk_store"
+
+# yfinance history cache (see live.HistoryCache)
+HISTORY_TTL = 300                      # seconds before the last bars are refreshed
+HISTORY_CACHE_BYTES = 64 * 1024 ** 2   # LRU eviction above this size
+HISTORY_PERIOD = "2y"                  # kept warm for every ticker by the scheduler (longest chart period)
+
+# Chart downsampling (see charts.downsample)
+CHART_WIDTH_PX = 1600      # full-width chart; narrower columns pass their own width
+CHART_POINTS_PER_PX = 2    # traces longer than width * this are downsampled
+
+# Background refresh (see scheduler.py), seconds
+REFRESH_INTERVALS = {"fred": 900, "quotes": 300, "news": 600, "corr": 900, "history": 300}
+REFRESH_RETRY = 60           # retry delay after a failed refresh
+REFRESH_COLD_TIMEOUT = 120   # max wait when a source has never loaded
+
+# Headless data service (see service.py). Leave SERVICE_URL empty to run the
+# fetch/enrich/alert pipeline inside the dashboard process instead.
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_URL = ""             # e.g. "http://127.0.0.1:8765"
+SERVICE_POLL = 5             # seconds between snapshot checks by ServiceClient
+
+# Streaming quote tape (see live.QuoteTape)
+QUOTE_STREAM_INTERVAL = 5    # seconds between upstream quote polls
+TAPE_RENDER_INTERVAL = 1     # seconds between tape fragment reruns in the dashboard
+
+# News ingestion (see live.NewsFeed)
+NEWS_QUERY = "stock market economy federal reserve"
+NEWS_BUFFER_SIZE = 200       # most recent unique articles kept (and persisted in STORE_DIR)
+NEWS_FETCH_SIZE = 50         # articles per NewsAPI page
+NEWS_MAX_PAGES = 2           # pages per poll (the free tier stops at 100 results)
+
+# Upstream clients (see sources.py): "live", "record" (live + save every
+# response to SOURCE_DIR) or "replay" (serve SOURCE_DIR only, no network)
+SOURCE_MODE = "live"
+SOURCE_DIR = "recordings"
+REPLAY_LATENCY = (0.0, 0.0)  # injected delay per replayed call, uniform in [lo, hi] seconds
+REPLAY_ERROR_RATE = 0.0      # share of replayed calls that raise
+REPLAY_SEED = 0
+
+# Background PDF reports (see report.ReportQueue)
+REPORT_WORKERS = 1           # render threads
+REPORT_CACHE_SIZE = 8        # finished PDFs kept, by content hash
+REPORT_POLL_INTERVAL = 1     # seconds between job status checks in the dashboard
+
+# Batch report rendering (see batch.py)
+BATCH_DIR = "reports"        # one dated subdirectory per run
+BATCH_WORKERS = 0            # render processes; 0 = one per core
@@ -1,56 +1,263 @@
 # data.py
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
 import pandas as pd
-from fredapi import Fred
-from config import FRED_API_KEY, SERIES, START_DATE, ROLLING_CORR_WINDOW
+from compact import CompactFrame
+from instrument import span, timed
+from sources import fred_client
+from store import SeriesStore
+from config import (
+    SERIES, START_DATE, ROLLING_CORR_WINDOW, ROLLING_RETURN_WINDOW, LOOKBACK_DAYS,
+    FETCH_WORKERS, FETCH_TIMEOUT, FETCH_RETRIES, FETCH_BACKOFF,
+)
+
+
+# ── CONCURRENT FETCH ────────────────────────────────────────
+def fetch_series(fred, requests, workers=FETCH_WORKERS, timeout=FETCH_TIMEOUT,
+                 retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, call=None):
+    # requests: {key: (series_id, observation_start)}
+    # call(series_id, observation_start): defaults to fred.get_series
+    # Returns ({key: result}, [error strings]); failures are collected, never raised.
+    # `timeout` only stops waiting on an attempt; the client's own socket
+    # timeout (sources.TimeoutFred) is what ends the abandoned call.
+    if call is None:
+        call = lambda series_id, start: fred.get_series(series_id, observation_start=start)
+    frames = {}
+    errors = []
+    pending = [(0.0, key, 0) for key in requests]   # (not_before, key, attempt)
+    heapq.heapify(pending)
+    running = {}                                     # future -> (key, attempt, started)
+    workers = max(1, workers)
+    # timed-out calls cannot be killed, so leave headroom for them to drain
+    pool = ThreadPoolExecutor(max_workers=workers * (retries + 1))
+
+    def fail(key, attempt, reason):
+        if attempt < retries:
+            heapq.heappush(pending, (time.monotonic() + backoff * 2 ** attempt, key, attempt + 1))
+        else:
+            errors.append(str(key) + ": " + reason)
+
+    try:
+        while pending or running:
+            now = time.monotonic()
+            while pending and pending[0][0] <= now and len(running) < workers:
+                _, key, attempt = heapq.heappop(pending)
+                series_id, start = requests[key]
+                fut = pool.submit(call, series_id, start)
+                running[fut] = (key, attempt, now)
+
+            deadlines = [started + timeout for _, _, started in running.values()]
+            if pending and len(running) < workers:
+                deadlines.append(pending[0][0])
+            wake = max(0.0, min(deadlines) - now) if deadlines else None
+            if running:
+                wait(list(running), timeout=wake, return_when=FIRST_COMPLETED)
+            elif wake:
+                time.sleep(wake)
+
+            now = time.monotonic()
+            for fut in list(running):
+                key, attempt, started = running[fut]
+                if fut.done():
+                    del running[fut]
+                    try:
+                        frames[key] = fut.result()
+                    except Exception as e:
+                        fail(key, attempt, str(e))
+                elif now - started >= timeout:
+                    del running[fut]
+                    fail(key, attempt, "timed out after " + str(timeout) + "s")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return frames, errors
+
+
+# Rows of history _enrich needs before a row to compute it (the rolling return
+# and correlation windows; YoY columns are built at native frequency in _clean)
+ENRICH_LOOKBACK = max(ROLLING_RETURN_WINDOW, ROLLING_CORR_WINDOW) + 1
+
+# Series whose year-over-year % change is added as <key>_YoY
+YOY_COLUMNS = ["CPI", "Core_PCE"]
+# Exact lag to the same observation one year earlier by FRED frequency_short
+# (weekly prints fall on the same weekday 52 weeks back); daily series use
+# the last observation on or before the date a year earlier instead.
+YOY_LAGS = {
+    "W": pd.DateOffset(weeks=52), "BW": pd.DateOffset(weeks=52),
+    "M": pd.DateOffset(years=1), "Q": pd.DateOffset(years=1),
+    "SA": pd.DateOffset(years=1), "A": pd.DateOffset(years=1),
+}
 
 
 class MarketData:
-    def __init__(self):
-        self.fred = Fred(api_key=FRED_API_KEY)
-        self.raw = pd.DataFrame()
-        self.df = pd.DataFrame()
+    # The enriched frame is kept as a CompactFrame (compact.py): native-frequency
+    # runs, float32 where precise enough. .df materializes it as a daily pandas
+    # frame on demand; hot readers should slice .frame instead.
+    def __init__(self, fred=None, workers=FETCH_WORKERS, store=None, series=None, start=START_DATE):
+        self.fred = fred if fred is not None else fred_client()
+        self.workers = workers
+        self.store = store if store is not None else SeriesStore()
+        self.series = series if series is not None else SERIES
+        self.start = start
+        self.base = []              # stored series the current frame was built from
+        self.frequencies = {}       # key -> native frequency (FRED frequency_short)
+        self.frame = CompactFrame(pd.DatetimeIndex([]), {})
+        self.version = ""
+        self.errors = []
+        self.lock = threading.RLock()
+
+    @property
+    def df(self):
+        return self.frame.frame()
+
+    @timed("data.load")
+    def load(self, fetch=True):
+        # fetch=False serves straight from the on-disk store, without any FRED call
+        if fetch:
+            self._fetch()
+        self._set(self._enrich(self._clean()))
+        return self.frame
+
+    def refresh(self):
+        # Incremental load: fetch new observations, then re-clean and re-enrich
+        # only the rows from the earliest new observation onwards (plus the
+        # ENRICH_LOOKBACK rows the rolling/pct_change windows need).
+        with self.lock, span("data.refresh") as sp:
+            if self.frame.empty:
+                sp.hit = False
+                return self.load()
+            new = {key: s for key, s in self._fetch().items() if len(s)}
+            sp.hit = not new          # nothing new upstream: the enriched frame is reused as is
+            if not new:
+                return self.frame
+            since = min(s.index.min() for s in new.values())
+            pos = self.frame.index.searchsorted(since)
+            if pos == 0 or not set(new) <= set(self.base):
+                return self.load(fetch=False)
 
-    def load(self):
-        self._fetch()
-        self._clean()
-        self._enrich()
-        return self.df
+            # Rows before `start` are untouched; rows [start, pos) only feed the windows.
+            start = max(0, pos - ENRICH_LOOKBACK)
+            window = self._enrich(self._clean(since=self.frame.index[start]))
+            head = self.frame.frame(stop=pos)
+            self._set(pd.concat([head, window.iloc[pos - start:][head.columns]]))
+            return self.frame
 
     def last_values(self):
-        return self.df.iloc[-1]
+        return self.frame.row(-1)
+
+    def _set(self, df):
+        self.frame = CompactFrame.from_frame(df)
+        self.version = self.frame.version()
 
     def _fetch(self):
-        frames = {}
-        errors = []
-        for key, meta in SERIES.items():
-            try:
-                frames[key] = self.fred.get_series(meta["id"], observation_start=START_DATE)
-            except Exception as e:
-                errors.append(str(key) + ": " + str(e))
+        # Only ask FRED for observations after what the store already holds.
+        today = pd.Timestamp.today().normalize()
+        requests = {}
+        for key, meta in self.series.items():
+            start = self.store.next_start(key, meta["id"], self.start)
+            if start <= today:
+                requests[key] = (meta["id"], start.strftime("%Y-%m-%d"))
+        with span("fred.fetch"):
+            frames, errors = fetch_series(self.fred, requests, workers=self.workers)
+        self.errors = errors
         if errors:
             print("[WARN] Could not fetch: " + ", ".join(errors))
-        self.raw = pd.DataFrame(frames)
+        with span("store.append"):
+            for key, series in frames.items():
+                series_id, start = requests[key]
+                self.store.append(key, series_id, series, start)
+        self._fetch_frequencies()
+        return frames
+
+    def _fetch_frequencies(self):
+        # Native frequency of every stored series, asked from FRED once (same
+        # timeout/retry path as the data) and then kept in the store meta.
+        # Clients without series metadata leave it to infer_frequency.
+        missing = [k for k in self.series if self.store.has(k) and self.store.frequency(k) is None]
+        if not missing or not hasattr(self.fred, "get_series_info"):
+            return
+        requests = {k: (self.series[k]["id"], None) for k in missing}
+        with span("fred.series_info"):
+            infos, errors = fetch_series(self.fred, requests, workers=self.workers,
+                                         call=lambda series_id, _: self.fred.get_series_info(series_id))
+        if errors:
+            print("[WARN] No FRED frequency, inferring it from the dates: " + ", ".join(errors))
+        for key, info in infos.items():
+            self.store.set_frequency(key, str(info["frequency_short"]).strip())
 
-    def _clean(self):
-        df = self.raw.copy()
-        for col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    @timed("data.clean")
+    def _clean(self, since=None):
+        # Daily frame over the union of every stored series' dates, forward-filled,
+        # from the first S&P 500 print on. since: only rows from that date, the
+        # fill seeded with each series' last observation before it. The raw
+        # columns are read (memory-mapped) from the store and not kept.
+        # YoY columns are computed on the native observations first and go
+        # through the same single alignment onto the daily grid.
+        with span("store.read"):
+            raw = {key: self.store.read(key) for key in self.series if self.store.has(key)}
+        self.base = list(raw)
+        self.frequencies = {k: self.store.frequency(k) or infer_frequency(s.index) for k, s in raw.items()}
+        for key in YOY_COLUMNS:
+            if key in raw:
+                raw[key + "_YoY"] = yoy(raw[key], self.frequencies[key])
+        if since is None:
+            df = pd.DataFrame(raw)
+        else:
+            seed = {k: s.iloc[:s.index.searchsorted(since)].dropna().iloc[-1:] for k, s in raw.items()}
+            seed = pd.DataFrame({k: [s.iloc[0] if len(s) else np.nan] for k, s in seed.items()},
+                                index=[since - pd.Timedelta(days=1)])
+            df = pd.concat([seed, pd.DataFrame({k: s[s.index >= since] for k, s in raw.items()})])
         df = df.ffill()
-        df = df.dropna(subset=["SP500"])
-        self.df = df
-
-    def _enrich(self):
-        df = self.df
-        if "SP500" in df.columns:
-            df["SP500_1D_Ret"] = df["SP500"].pct_change() * 100
-            df["SP500_20D_Ret"] = df["SP500"].pct_change(20) * 100
-        for col in ["CPI", "Core_PCE"]:
-            if col in df.columns:
-                df[col + "_YoY"] = df[col].pct_change(252) * 100
-        if "SP500" in df.columns and "Bond_10Y" in df.columns:
-            sp_ret = df["SP500"].pct_change()
-            bond_chg = df["Bond_10Y"].diff()
-            df["Stock_Bond_Corr"] = sp_ret.rolling(30).corr(bond_chg)
-        if "Bond_10Y" in df.columns and "Fed_Rate" in df.columns:
-            df["Rate_Gap"] = df["Bond_10Y"] - df["Fed_Rate"]
-        self.df = df
+        if since is not None:
+            df = df.iloc[1:]
+        return df.dropna(subset=["SP500"])
+
+    @timed("data.enrich")
+    def _enrich(self, df):
+        return enrich(df)
+
+
+def lookback_offsets(index, now=None):
+    # First row of each LOOKBACK_DAYS period in a sorted DatetimeIndex, by
+    # binary search; df.iloc[offset:] is then the (zero-copy) lookback view.
+    now = pd.Timestamp.today() if now is None else now
+    return {label: int(index.searchsorted(now - pd.Timedelta(days=days)))
+            for label, days in LOOKBACK_DAYS.items()}
+
+
+def infer_frequency(index):
+    # Fallback when FRED metadata is unavailable: median spacing of the dates.
+    if len(index) < 3:
+        return "D"
+    days = np.median(np.diff(index.values).astype("timedelta64[D]").astype("int64"))
+    for freq, min_days in [("A", 300), ("SA", 150), ("Q", 80), ("M", 25), ("BW", 12), ("W", 6)]:
+        if days >= min_days:
+            return freq
+    return "D"
+
+def yoy(s, freq):
+    # % change vs one year earlier, matched by date rather than by position so
+    # a missing print (e.g. no CPI for a month) gives NaN for the months it
+    # affects instead of shifting every later comparison by one observation.
+    s = s.dropna()
+    lag = YOY_LAGS.get(freq)
+    if lag is not None:
+        prev = s.reindex(s.index - lag).to_numpy()
+    else:
+        prev = s.reindex(s.index - pd.DateOffset(years=1), method="ffill").to_numpy()
+    return (s / prev - 1) * 100
+
+
+def enrich(df):
+    if "SP500" in df.columns:
+        df["SP500_1D_Ret"] = df["SP500"].pct_change() * 100
+        df["SP500_" + str(ROLLING_RETURN_WINDOW) + "D_Ret"] = df["SP500"].pct_change(ROLLING_RETURN_WINDOW) * 100
+    if "SP500" in df.columns and "Bond_10Y" in df.columns:
+        sp_ret = df["SP500"].pct_change()
+        bond_chg = df["Bond_10Y"].diff()
+        df["Stock_Bond_Corr"] = sp_ret.rolling(ROLLING_CORR_WINDOW).corr(bond_chg)
+    if "Bond_10Y" in df.columns and "Fed_Rate" in df.columns:
+        df["Rate_Gap"] = df["Bond_10Y"] - df["Fed_Rate"]
+    return df
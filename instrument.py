@@ -0,0 +1,134 @@
+# instrument.py — lightweight timing spans for the hot paths
+#   with span("data.enrich"): ...         time a block
+#   @timed("report.generate_pdf")         time every call of a function
+#   with span("live.history") as s:       record a cache outcome on the span
+#       s.hit = ticker in cache
+# Aggregates live in the process-wide METRICS registry (count, total, last,
+# max, errors, cache hits/misses per span) and export as JSON or Prometheus text.
+import functools
+import threading
+import time
+from collections import deque
+
+PROM_PREFIX = "mkttrk"
+RECENT_SPANS = 200          # last spans kept for the diagnostics panel
+
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.duration = 0.0
+        self.hit = None         # True/False when the span guards a cache
+        self.error = False
+        self._t0 = 0.0
+
+    def __enter__(self):
+        _stack().append(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        self.error = exc_type is not None
+        _stack().pop()
+        METRICS.record(self)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.stats = {}         # name -> {"count", "total", "last", "max", "errors", "hits", "misses"}
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, s):
+        with self.lock:
+            st = self.stats.get(s.name)
+            if st is None:
+                st = self.stats[s.name] = {"count": 0, "total": 0.0, "last": 0.0, "max": 0.0,
+                                           "errors": 0, "hits": 0, "misses": 0}
+            st["count"] += 1
+            st["total"] += s.duration
+            st["last"] = s.duration
+            st["max"] = max(st["max"], s.duration)
+            st["errors"] += s.error
+            if s.hit is not None:
+                st["hits" if s.hit else "misses"] += 1
+            self.recent.append((s.start, s.name, s.duration, s.hit, s.error))
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.recent.clear()
+            self.started = time.time()
+
+    def table(self):
+        # one row per span, slowest total first
+        with self.lock:
+            rows = [dict(span=name, **st) for name, st in self.stats.items()]
+        for r in rows:
+            r["mean"] = r["total"] / r["count"]
+            lookups = r["hits"] + r["misses"]
+            r["hit_rate"] = r["hits"] / lookups if lookups else None
+        return sorted(rows, key=lambda r: -r["total"])
+
+    def to_json(self):
+        with self.lock:
+            recent = [{"start": t, "span": n, "duration": d, "hit": h, "error": e}
+                      for t, n, d, h, e in self.recent]
+        return {"started": self.started, "spans": self.table(), "recent": recent}
+
+    def to_prometheus(self):
+        p = PROM_PREFIX
+        lines = [
+            "# HELP " + p + "_span_seconds Time spent in instrumented spans.",
+            "# TYPE " + p + "_span_seconds summary",
+        ]
+        rows = self.table()
+        for r in rows:
+            lbl = '{span="' + r["span"] + '"}'
+            lines.append(p + "_span_seconds_count" + lbl + " " + str(r["count"]))
+            lines.append(p + "_span_seconds_sum" + lbl + " " + repr(r["total"]))
+        for metric, key, kind, help_ in [
+            ("span_max_seconds", "max", "gauge", "Slowest single span since start."),
+            ("span_last_seconds", "last", "gauge", "Duration of the most recent span."),
+            ("span_errors_total", "errors", "counter", "Spans that raised."),
+            ("cache_hits_total", "hits", "counter", "Spans served from a cache."),
+            ("cache_misses_total", "misses", "counter", "Spans that missed their cache."),
+        ]:
+            lines.append("# HELP " + p + "_" + metric + " " + help_)
+            lines.append("# TYPE " + p + "_" + metric + " " + kind)
+            for r in rows:
+                lines.append(p + "_" + metric + '{span="' + r["span"] + '"} ' + repr(r[key]))
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+_local = threading.local()
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def span(name):
+    return Span(name)
+
+def current():
+    # Innermost open span on this thread (None outside any span), e.g. for a
+    # cached function to flag the miss on the span that called it.
+    stack = _stack()
+    return stack[-1] if stack else None
+
+def timed(name=None):
+    def wrap(fn):
+        label = name or fn.__module__ + "." + fn.__name__
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with Span(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
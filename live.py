@@ -1,67 +1,365 @@
 # live.py
-import yfinance as yf
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
 import pandas as pd
-from newsapi import NewsApiClient
-from config import YFINANCE_TICKERS, NEWS_API_KEY
+from instrument import span
+from sources import PERIODS, bars_by_ticker, news_client, yf_client
+from config import (
+    YFINANCE_TICKERS, HISTORY_TTL, HISTORY_CACHE_BYTES, QUOTE_STREAM_INTERVAL,
+    STORE_DIR, NEWS_QUERY, NEWS_BUFFER_SIZE, NEWS_FETCH_SIZE, NEWS_MAX_PAGES,
+)
 
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+NEWS_COLUMNS = ["title", "source", "url", "publishedAt", "description"]
 
-class LiveData:
+PERIOD_RANK = {p: i for i, p in enumerate(PERIODS)}
+
+
+def _normalize_bars(hist):
+    bars = hist[[c for c in OHLCV if c in hist.columns]].dropna(how="all")
+    idx = pd.DatetimeIndex(bars.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    bars.index = idx.normalize()
+    return bars
+
+def _splice_bars(bars, tail):
+    # bars with the dates from tail's first one on replaced by tail
+    if tail.empty:
+        return bars
+    return pd.concat([bars[bars.index < tail.index[0]], tail])
+
+def _article(a):
+    return {
+        "title":       a.get("title") or "",
+        "source":      (a.get("source") or {}).get("name") or "",
+        "url":         a.get("url") or "",
+        "publishedAt": a.get("publishedAt") or "",
+        "description": a.get("description") or "",
+    }
+
+def _news_time(published):
+    # NewsAPI publishedAt ("2026-10-18T05:12:34Z") -> naive UTC
+    # "YYYY-MM-DDTHH:MM:SS", the only datetime form from_param accepts.
+    try:
+        ts = pd.Timestamp(published)
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(ts):
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return ts.strftime("%Y-%m-%dT%H:%M:%S")
+
+def _article_key(a):
+    # Syndicated copies often share a title under different URLs, and some
+    # sources reuse one URL for updated headlines: either match is a duplicate.
+    return a["url"], hashlib.sha1(a["title"].strip().lower().encode()).hexdigest()[:16]
+
+
+# ── HISTORY CACHE ───────────────────────────────────────────
+class HistoryCache:
+    # One OHLCV frame per ticker covering the longest period asked for so far.
+    # Shorter periods are served by slicing; stale entries only refetch the
+    # last few bars. Least recently used tickers are dropped above max_bytes.
+    def __init__(self, max_bytes=HISTORY_CACHE_BYTES, ttl=HISTORY_TTL, yf=None):
+        self.yf = yf if yf is not None else yf_client()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()   # ticker -> {"bars", "period", "fetched", "nbytes"}
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, ticker, period="1y"):
+        with span("live.history") as sp:
+            with self.lock:
+                entry = self.entries.get(ticker)
+                if entry is not None:
+                    self.entries.move_to_end(ticker)
+            sp.hit = False
+            if entry is None or PERIOD_RANK[period] > PERIOD_RANK[entry["period"]]:
+                with span("yfinance.history"):
+                    bars = _normalize_bars(self.yf.Ticker(ticker).history(period=period))
+                entry = self.put(ticker, bars, period)
+            elif self.is_stale(ticker):
+                with span("yfinance.history"):
+                    tail = _normalize_bars(self.yf.Ticker(ticker).history(period="5d"))
+                entry = self.merge(ticker, tail)
+            else:
+                sp.hit = True
+            return self._slice(entry, period)
+
+    def cached(self, ticker, period="1y"):
+        # What get() would serve from memory, stale or not, without any fetch;
+        # None when the ticker isn't cached or only for a shorter period.
+        entry = self._entry(ticker)
+        if entry is None or PERIOD_RANK[period] > PERIOD_RANK[entry["period"]]:
+            return None
+        return self._slice(entry, period)
+
+    def is_stale(self, ticker, ttl=None):
+        entry = self._entry(ticker)
+        ttl = self.ttl if ttl is None else ttl
+        return entry is None or time.monotonic() - entry["fetched"] > ttl
+
+    def slice(self, ticker, period):
+        return self._slice(self._entry(ticker), period)
+
+    def _entry(self, ticker):
+        # Entries are never modified, only replaced: the dict read is all a
+        # reader needs to hold on to.
+        with self.lock:
+            return self.entries.get(ticker)
+
+    def _slice(self, entry, period):
+        if entry is None:
+            return pd.DataFrame(columns=OHLCV)
+        bars = entry["bars"]
+        offset = PERIODS[period]
+        if offset is None or bars.empty:
+            return bars
+        start = pd.Timestamp.today().normalize() - offset
+        return bars.iloc[bars.index.searchsorted(start):]
+
+    def put(self, ticker, bars, period):
+        # Concurrent fetches can land in any order: bars for a shorter period
+        # than the entry already covers are merged into it instead.
+        with self.lock:
+            old = self.entries.get(ticker)
+            if old is not None and PERIOD_RANK[old["period"]] > PERIOD_RANK[period]:
+                return self._store(ticker, _splice_bars(old["bars"], bars), old["period"])
+            return self._store(ticker, bars, period)
+
+    def merge(self, ticker, tail):
+        # Append/overwrite the most recent bars of whatever the entry holds
+        # now, keeping the covered period.
+        with self.lock:
+            old = self.entries.get(ticker)
+            if old is None:
+                return self._store(ticker, tail, "5d")
+            return self._store(ticker, _splice_bars(old["bars"], tail), old["period"])
+
+    def _store(self, ticker, bars, period):
+        # Under self.lock; one assignment swaps the entry, so readers see the
+        # old one or the new one, never neither.
+        old = self.entries.get(ticker)
+        nbytes = int(bars.memory_usage(index=True).sum())
+        entry = {"bars": bars, "period": period, "fetched": time.monotonic(), "nbytes": nbytes}
+        self.entries[ticker] = entry
+        self.entries.move_to_end(ticker)
+        self.nbytes += nbytes - (old["nbytes"] if old is not None else 0)
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted["nbytes"]
+        return entry
+
+
+HISTORY = HistoryCache()
+
+
+# ── QUOTE TAPE ──────────────────────────────────────────────
+class QuoteTape:
+    # Latest quote per ticker, patched in place from stream_quotes deltas by a
+    # background thread running its own event loop. seq bumps on every change
+    # so readers (the dashboard tape fragment) redraw only when something moved.
     def __init__(self):
-        self.newsapi = NewsApiClient(api_key=NEWS_API_KEY)
+        self.rows = {}
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.thread = None
 
-    # ── YFINANCE ────────────────────────────────────────────
-    def get_quotes(self):
-        rows = []
-        for ticker, label in YFINANCE_TICKERS.items():
+    def apply(self, delta):
+        with self.lock:
+            for row in delta.to_dict("records"):
+                self.rows[row["Ticker"]] = row
+            self.seq += 1
+
+    def frame(self):
+        with self.lock:
+            rows = [self.rows[t] for t in YFINANCE_TICKERS if t in self.rows]
+        return pd.DataFrame(rows, columns=["Ticker", "Nom", "Prix", "Chg $", "Chg %"])
+
+    def start(self, live, interval=QUOTE_STREAM_INTERVAL):
+        if self.thread is None:
+            self.thread = threading.Thread(target=lambda: asyncio.run(self._consume(live, interval)),
+                                           name="quote-tape", daemon=True)
+            self.thread.start()
+        return self
+
+    async def _consume(self, live, interval):
+        while True:
             try:
-                t = yf.Ticker(ticker)
-                hist = t.history(period="5d")
-                if hist.empty:
+                async for delta in live.stream_quotes(interval):
+                    self.apply(delta)
+            except Exception as e:
+                print("Error in quote stream: " + str(e))
+                await asyncio.sleep(interval)
+
+
+# ── NEWS FEED ───────────────────────────────────────────────
+class NewsFeed:
+    # Bounded buffer of the most recent unique articles, newest first. Each
+    # poll only asks NewsAPI for articles published since the newest one already
+    # held (the watermark), fetching extra pages concurrently, and the buffer is
+    # persisted so a restart does not spend quota re-reading the same headlines.
+    def __init__(self, client, query=NEWS_QUERY, capacity=NEWS_BUFFER_SIZE,
+                 path=os.path.join(STORE_DIR, "news.json")):
+        self.client = client
+        self.query = query
+        self.path = path
+        self.articles = deque(maxlen=capacity)
+        self.watermark = None          # publishedAt of the newest article held, as naive UTC
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print("[WARN] Could not read news buffer: " + str(e))
+            return
+        if state.get("query") == self.query:
+            self.articles.extend(state["articles"][:self.articles.maxlen])
+            self.watermark = _news_time(state.get("watermark"))
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"query": self.query, "watermark": self.watermark,
+                       "articles": list(self.articles)}, f)
+        os.replace(tmp, self.path)
+
+    def _page(self, page):
+        with span("newsapi.get_everything"):
+            return self.client.get_everything(
+                q=self.query, language="en", sort_by="publishedAt",
+                from_param=self.watermark, page=page, page_size=NEWS_FETCH_SIZE,
+            )
+
+    async def poll(self):
+        # -> number of new articles added
+        first = await asyncio.to_thread(self._page, 1)
+        responses = [first]
+        pages = min(NEWS_MAX_PAGES, -(-first.get("totalResults", 0) // NEWS_FETCH_SIZE))
+        if pages > 1:
+            responses += await asyncio.gather(*(asyncio.to_thread(self._page, p) for p in range(2, pages + 1)))
+        fetched = [_article(a) for r in responses for a in r.get("articles", [])]
+        with self.lock:
+            seen = set()
+            for a in self.articles:
+                seen.update(_article_key(a))
+            fresh = []
+            for a in fetched:
+                key = _article_key(a)
+                if not a["title"] or key[0] in seen or key[1] in seen:
                     continue
-                last_close = hist["Close"].iloc[-1]
-                prev_close = hist["Close"].iloc[-2]
-                change     = last_close - prev_close
-                change_pct = (change / prev_close) * 100
-                rows.append({
-                    "Ticker":  ticker,
-                    "Nom":     label,
-                    "Prix":    round(last_close, 2),
-                    "Chg $":   round(change, 2),
-                    "Chg %":   round(change_pct, 2),
-                })
+                seen.update(key)
+                fresh.append(a)
+            if not fresh:
+                return 0
+            fresh.sort(key=lambda a: a["publishedAt"])
+            self.articles.extendleft(fresh)     # oldest first, so the newest ends up in front
+            self.watermark = _news_time(self.articles[0]["publishedAt"]) or self.watermark
+            self._save()
+        return len(fresh)
+
+    def frame(self, n=None):
+        with self.lock:
+            rows = list(self.articles)[:n]
+        return pd.DataFrame(rows, columns=NEWS_COLUMNS)
+
+    def refresh(self, n=None):
+        # Blocking entry point for the refresh scheduler; keeps the buffer on error.
+        # A poll that finds nothing newer than the watermark counts as a cache hit.
+        with span("news.refresh") as sp:
+            try:
+                sp.hit = asyncio.run(self.poll()) == 0
+            except Exception as e:
+                print("Error fetching news: " + str(e))
+            return self.frame(n)
+
+
+class LiveData:
+    def __init__(self, history=None, tickers=None, yf=None, newsapi=None):
+        # yf / newsapi: clients from sources.py (live, record or replay per
+        # SOURCE_MODE). A custom yf gets its own history cache unless one is given.
+        self.tickers = tickers if tickers is not None else YFINANCE_TICKERS
+        self.yf = yf if yf is not None else HISTORY.yf
+        self.newsapi = newsapi if newsapi is not None else news_client()
+        if history is None:
+            history = HISTORY if yf is None else HistoryCache(yf=yf)
+        self.history = history
+        self.news = NewsFeed(self.newsapi)
+
+    # ── YFINANCE ────────────────────────────────────────────
+    def get_quotes(self, max_age=None):
+        # One multi-symbol request for the tickers whose cached bars are older
+        # than max_age (default HISTORY_TTL); last two closes then come from the
+        # shared history cache.
+        with span("live.quotes") as sp:
+            return self._quotes(max_age, sp)
+
+    def _quotes(self, max_age, sp):
+        stale = [t for t in self.tickers if self.history.is_stale(t, max_age)]
+        sp.hit = not stale
+        if stale:
+            try:
+                with span("yfinance.download"):
+                    data = self.yf.download(stale, period="5d", group_by="ticker",
+                                            threads=True, progress=False)
             except Exception as e:
-                print("Error fetching " + ticker + ": " + str(e))
+                print("Error fetching quotes: " + str(e))
+                data = None
+            if data is not None and not data.empty:
+                for ticker, bars in bars_by_ticker(data, stale).items():
+                    self.history.merge(ticker, _normalize_bars(bars))
+        rows = []
+        for ticker, label in self.tickers.items():
+            close = self.history.slice(ticker, "max").get("Close", pd.Series(dtype="float64")).dropna()
+            if len(close) < 2:
+                print("Error fetching " + ticker + ": not enough history")
+                continue
+            last_close = float(close.iloc[-1])
+            prev_close = float(close.iloc[-2])
+            change     = last_close - prev_close
+            change_pct = (change / prev_close) * 100
+            rows.append({
+                "Ticker":  ticker,
+                "Nom":     label,
+                "Prix":    round(last_close, 2),
+                "Chg $":   round(change, 2),
+                "Chg %":   round(change_pct, 2),
+            })
         return pd.DataFrame(rows)
 
+    async def stream_quotes(self, interval=QUOTE_STREAM_INTERVAL):
+        # Polls the batched quote download and yields only the rows whose
+        # price or change moved since the previous poll.
+        seen = {}
+        while True:
+            quotes = await asyncio.to_thread(self.get_quotes, interval)
+            if not quotes.empty:
+                key = list(zip(quotes["Prix"], quotes["Chg %"]))
+                changed = [seen.get(t) != k for t, k in zip(quotes["Ticker"], key)]
+                seen.update(zip(quotes["Ticker"], key))
+                delta = quotes[changed]
+                if not delta.empty:
+                    yield delta
+            await asyncio.sleep(interval)
+
     def get_history(self, ticker, period="1y"):
         try:
-            t = yf.Ticker(ticker)
-            hist = t.history(period=period)
-            return hist
+            return self.history.get(ticker, period)
         except Exception as e:
             print("Error fetching history for " + ticker + ": " + str(e))
             return pd.DataFrame()
 
-    # ── NEWSAPI ─────────────────────────────────────────────
-    def get_news(self, query="stock market finance economy", page_size=10):
-        try:
-            response = self.newsapi.get_everything(
-                q=query,
-                language="en",
-                sort_by="publishedAt",
-                page_size=page_size,
-            )
-            articles = response.get("articles", [])
-            rows = []
-            for a in articles:
-                rows.append({
-                    "title":       a.get("title", ""),
-                    "source":      a.get("source", {}).get("name", ""),
-                    "url":         a.get("url", ""),
-                    "publishedAt": a.get("publishedAt", ""),
-                    "description": a.get("description", ""),
-                })
-            return pd.DataFrame(rows)
-        except Exception as e:
-            print("Error fetching news: " + str(e))
-            return pd.DataFrame()
@@ -1,5 +1,12 @@
 # report.py — Daily Market Report PDF Generator
+# generate_pdf renders synchronously; REPORTS renders in the background and
+# caches finished PDFs by content hash, so repeated requests for the same data
+# are served without rendering again.
+import hashlib
 import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pandas as pd
 from reportlab.lib.pagesizes import A4
@@ -8,6 +15,8 @@ from reportlab.lib.units import mm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
+from instrument import span, timed
+from config import REPORT_WORKERS, REPORT_CACHE_SIZE
 
 
 # ── COLORS ──────────────────────────────────────────────────
@@ -57,8 +66,76 @@ def make_styles():
         "news_meta": ParagraphStyle("news_meta",
             fontName="Helvetica", fontSize=8,
             textColor=SUBTEXT, leading=11, spaceAfter=8),
+        "risk_red":    ParagraphStyle("risk_red",
+            fontName="Helvetica-Bold", fontSize=14, textColor=RED),
+        "risk_yellow": ParagraphStyle("risk_yellow",
+            fontName="Helvetica-Bold", fontSize=14, textColor=YELLOW),
+        "risk_green":  ParagraphStyle("risk_green",
+            fontName="Helvetica-Bold", fontSize=14, textColor=GREEN),
     }
 
+# Built once: styles are never mutated while rendering, so every report shares them.
+STYLES = make_styles()
+
+HEADER_STYLE = TableStyle([
+    ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+    ("ALIGN",  (1,0), (1,0),  "RIGHT"),
+    ("BACKGROUND", (0,0), (-1,-1), BG),
+    ("LINEBELOW", (0,0), (-1,0), 1, ACCENT),
+    ("BOTTOMPADDING", (0,0), (-1,-1), 10),
+])
+
+RISK_STYLE = TableStyle([
+    ("BACKGROUND", (0,0), (-1,-1), PANEL),
+    ("BOX", (0,0), (-1,-1), 1, BORDER),
+    ("LEFTPADDING",  (0,0), (-1,-1), 12),
+    ("RIGHTPADDING", (0,0), (-1,-1), 12),
+    ("TOPPADDING",   (0,0), (-1,-1), 10),
+    ("BOTTOMPADDING",(0,0), (-1,-1), 10),
+    ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+])
+
+MACRO_STYLE = TableStyle([
+    ("BACKGROUND",    (0,0), (-1,0),  BORDER),
+    ("BACKGROUND",    (0,1), (-1,-1), PANEL),
+    ("TEXTCOLOR",     (0,0), (-1,0),  SUBTEXT),
+    ("TEXTCOLOR",     (0,1), (-1,-1), TEXT),
+    ("TEXTCOLOR",     (1,1), (1,-1),  WHITE),
+    ("TEXTCOLOR",     (3,1), (3,-1),  WHITE),
+    ("FONTNAME",      (0,0), (-1,0),  "Helvetica-Bold"),
+    ("FONTSIZE",      (0,0), (-1,0),  7),
+    ("FONTNAME",      (0,1), (-1,-1), "Helvetica"),
+    ("FONTSIZE",      (0,1), (-1,-1), 9),
+    ("FONTNAME",      (1,1), (1,-1),  "Helvetica-Bold"),
+    ("FONTNAME",      (3,1), (3,-1),  "Helvetica-Bold"),
+    ("FONTSIZE",      (1,1), (1,-1),  11),
+    ("FONTSIZE",      (3,1), (3,-1),  11),
+    ("GRID",          (0,0), (-1,-1), 0.5, BORDER),
+    ("LEFTPADDING",   (0,0), (-1,-1), 10),
+    ("RIGHTPADDING",  (0,0), (-1,-1), 10),
+    ("TOPPADDING",    (0,0), (-1,-1), 7),
+    ("BOTTOMPADDING", (0,0), (-1,-1), 7),
+    ("LETTERSPACEING",(0,0), (-1,0),  2),
+])
+
+# Per-row gain/loss colors are added on top of this for each report.
+QUOTES_STYLE = TableStyle([
+    ("BACKGROUND",    (0,0), (-1,0),  BORDER),
+    ("BACKGROUND",    (0,1), (-1,-1), PANEL),
+    ("TEXTCOLOR",     (0,0), (-1,0),  SUBTEXT),
+    ("TEXTCOLOR",     (0,1), (-1,-1), TEXT),
+    ("FONTNAME",      (0,0), (-1,0),  "Helvetica-Bold"),
+    ("FONTSIZE",      (0,0), (-1,0),  7),
+    ("FONTNAME",      (0,1), (-1,-1), "Helvetica"),
+    ("FONTSIZE",      (0,1), (-1,-1), 9),
+    ("GRID",          (0,0), (-1,-1), 0.5, BORDER),
+    ("LEFTPADDING",   (0,0), (-1,-1), 10),
+    ("RIGHTPADDING",  (0,0), (-1,-1), 10),
+    ("TOPPADDING",    (0,0), (-1,-1), 6),
+    ("BOTTOMPADDING", (0,0), (-1,-1), 6),
+    ("ALIGN",         (2,0), (-1,-1), "RIGHT"),
+])
+
 
 def fmt(val, decimals=2, suffix=""):
     if val is None or pd.isna(val): return "N/A"
@@ -71,12 +148,13 @@ def delta_str(val):
 
 
 # ── MAIN GENERATOR ──────────────────────────────────────────
+@timed()
 def generate_pdf(last: pd.Series, quotes: pd.DataFrame, news: pd.DataFrame, alerts, score: int, risk_label: str) -> bytes:
     buf    = io.BytesIO()
     doc    = SimpleDocTemplate(buf, pagesize=A4,
                 leftMargin=20*mm, rightMargin=20*mm,
                 topMargin=16*mm, bottomMargin=16*mm)
-    styles = make_styles()
+    styles = STYLES
     story  = []
     today  = datetime.now().strftime("%A, %B %d %Y")
     time   = datetime.now().strftime("%H:%M EST")
@@ -87,33 +165,18 @@ def generate_pdf(last: pd.Series, quotes: pd.DataFrame, news: pd.DataFrame, aler
         Paragraph(f"DAILY MARKET REPORT<br/>{today} · {time}", styles["subtitle"]),
     ]]
     header_table = Table(header_data, colWidths=["50%", "50%"])
-    header_table.setStyle(TableStyle([
-        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-        ("ALIGN",  (1,0), (1,0),  "RIGHT"),
-        ("BACKGROUND", (0,0), (-1,-1), BG),
-        ("LINEBELOW", (0,0), (-1,0), 1, ACCENT),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 10),
-    ]))
+    header_table.setStyle(HEADER_STYLE)
     story.append(header_table)
     story.append(Spacer(1, 8))
 
     # ── RISK SCORE ──────────────────────────────────────────
-    risk_color = RED if score >= 60 else YELLOW if score >= 30 else GREEN
+    risk_style = "risk_red" if score >= 60 else "risk_yellow" if score >= 30 else "risk_green"
     risk_data = [[
         Paragraph("COMPOSITE RISK SCORE", styles["section"]),
-        Paragraph(f"{score} / 100  ·  {risk_label}", ParagraphStyle("rs",
-            fontName="Helvetica-Bold", fontSize=14, textColor=risk_color)),
+        Paragraph(f"{score} / 100  ·  {risk_label}", styles[risk_style]),
     ]]
     risk_table = Table(risk_data, colWidths=["40%", "60%"])
-    risk_table.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,-1), PANEL),
-        ("BOX", (0,0), (-1,-1), 1, BORDER),
-        ("LEFTPADDING",  (0,0), (-1,-1), 12),
-        ("RIGHTPADDING", (0,0), (-1,-1), 12),
-        ("TOPPADDING",   (0,0), (-1,-1), 10),
-        ("BOTTOMPADDING",(0,0), (-1,-1), 10),
-        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-    ]))
+    risk_table.setStyle(RISK_STYLE)
     story.append(risk_table)
     story.append(Spacer(1, 8))
 
@@ -131,28 +194,7 @@ def generate_pdf(last: pd.Series, quotes: pd.DataFrame, news: pd.DataFrame, aler
 
     col_w = ["25%", "25%", "25%", "25%"]
     macro_table = Table(macro_data, colWidths=col_w)
-    macro_table.setStyle(TableStyle([
-        ("BACKGROUND",    (0,0), (-1,0),  BORDER),
-        ("BACKGROUND",    (0,1), (-1,-1), PANEL),
-        ("TEXTCOLOR",     (0,0), (-1,0),  SUBTEXT),
-        ("TEXTCOLOR",     (0,1), (-1,-1), TEXT),
-        ("TEXTCOLOR",     (1,1), (1,-1),  WHITE),
-        ("TEXTCOLOR",     (3,1), (3,-1),  WHITE),
-        ("FONTNAME",      (0,0), (-1,0),  "Helvetica-Bold"),
-        ("FONTSIZE",      (0,0), (-1,0),  7),
-        ("FONTNAME",      (0,1), (-1,-1), "Helvetica"),
-        ("FONTSIZE",      (0,1), (-1,-1), 9),
-        ("FONTNAME",      (1,1), (1,-1),  "Helvetica-Bold"),
-        ("FONTNAME",      (3,1), (3,-1),  "Helvetica-Bold"),
-        ("FONTSIZE",      (1,1), (1,-1),  11),
-        ("FONTSIZE",      (3,1), (3,-1),  11),
-        ("GRID",          (0,0), (-1,-1), 0.5, BORDER),
-        ("LEFTPADDING",   (0,0), (-1,-1), 10),
-        ("RIGHTPADDING",  (0,0), (-1,-1), 10),
-        ("TOPPADDING",    (0,0), (-1,-1), 7),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 7),
-        ("LETTERSPACEING",(0,0), (-1,0),  2),
-    ]))
+    macro_table.setStyle(MACRO_STYLE)
     story.append(macro_table)
     story.append(Spacer(1, 8))
 
@@ -169,27 +211,13 @@ def generate_pdf(last: pd.Series, quotes: pd.DataFrame, news: pd.DataFrame, aler
                 f"{r['Chg %']:+.2f}%",
             ])
         q_table = Table(q_data, colWidths=["12%","38%","18%","16%","16%"])
-        q_style = [
-            ("BACKGROUND",    (0,0), (-1,0),  BORDER),
-            ("BACKGROUND",    (0,1), (-1,-1), PANEL),
-            ("TEXTCOLOR",     (0,0), (-1,0),  SUBTEXT),
-            ("TEXTCOLOR",     (0,1), (-1,-1), TEXT),
-            ("FONTNAME",      (0,0), (-1,0),  "Helvetica-Bold"),
-            ("FONTSIZE",      (0,0), (-1,0),  7),
-            ("FONTNAME",      (0,1), (-1,-1), "Helvetica"),
-            ("FONTSIZE",      (0,1), (-1,-1), 9),
-            ("GRID",          (0,0), (-1,-1), 0.5, BORDER),
-            ("LEFTPADDING",   (0,0), (-1,-1), 10),
-            ("RIGHTPADDING",  (0,0), (-1,-1), 10),
-            ("TOPPADDING",    (0,0), (-1,-1), 6),
-            ("BOTTOMPADDING", (0,0), (-1,-1), 6),
-            ("ALIGN",         (2,0), (-1,-1), "RIGHT"),
-        ]
+        q_table.setStyle(QUOTES_STYLE)
+        q_colors = []
         for i, row in enumerate(quotes.itertuples(), start=1):
             color = GREEN if row._4 >= 0 else RED
-            q_style.append(("TEXTCOLOR", (3,i), (4,i), color))
-            q_style.append(("FONTNAME",  (3,i), (4,i), "Helvetica-Bold"))
-        q_table.setStyle(TableStyle(q_style))
+            q_colors.append(("TEXTCOLOR", (3,i), (4,i), color))
+            q_colors.append(("FONTNAME",  (3,i), (4,i), "Helvetica-Bold"))
+        q_table.setStyle(TableStyle(q_colors))
         story.append(q_table)
         story.append(Spacer(1, 8))
 
@@ -219,6 +247,78 @@ def generate_pdf(last: pd.Series, quotes: pd.DataFrame, news: pd.DataFrame, aler
         styles["small"]
     ))
 
-    doc.build(story)
+    with span("report.build"):
+        doc.build(story)
     buf.seek(0)
     return buf.read()
+
+
+# ── BACKGROUND JOBS ─────────────────────────────────────────
+def report_key(last, quotes, news, alerts, score, risk_label):
+    # Content hash of everything the PDF shows (the generation timestamp aside).
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(last, index=True).values.tobytes())
+    for df in (quotes, news):
+        if not df.empty:
+            h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    for a in alerts:
+        h.update((a.level + "|" + a.message + "\n").encode())
+    h.update((str(score) + "|" + risk_label).encode())
+    return h.hexdigest()[:16]
+
+
+class ReportQueue:
+    # Renders PDFs on a worker pool. submit() returns the content key at once;
+    # status()/result() poll it. Identical requests share one job, and the last
+    # REPORT_CACHE_SIZE finished PDFs are kept (LRU).
+    def __init__(self, workers=REPORT_WORKERS, capacity=REPORT_CACHE_SIZE):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self.capacity = capacity
+        self.jobs = {}              # key -> Future still rendering
+        self.done = OrderedDict()   # key -> pdf bytes
+        self.errors = {}            # key -> exception of the last failed render
+        self.lock = threading.Lock()
+
+    def submit(self, last, quotes, news, alerts, score, risk_label):
+        key = report_key(last, quotes, news, alerts, score, risk_label)
+        with self.lock:
+            if key in self.done:
+                self.done.move_to_end(key)
+                return key
+            if key not in self.jobs:
+                self.errors.pop(key, None)
+                self.jobs[key] = self.pool.submit(self._render, key, last, quotes, news,
+                                                  list(alerts), score, risk_label)
+        return key
+
+    def _render(self, key, *args):
+        try:
+            pdf = generate_pdf(*args)
+        except Exception as e:
+            print("Error generating report: " + str(e))
+            with self.lock:
+                self.errors[key] = e
+                self.jobs.pop(key, None)
+            return
+        with self.lock:
+            self.done[key] = pdf
+            self.done.move_to_end(key)
+            while len(self.done) > self.capacity:
+                self.done.popitem(last=False)
+            self.jobs.pop(key, None)
+
+    def status(self, key):
+        # "done" | "running" | "error" | "unknown" (evicted or never submitted)
+        with self.lock:
+            if key in self.done:
+                return "done"
+            if key in self.jobs:
+                return "running"
+            return "error" if key in self.errors else "unknown"
+
+    def result(self, key):
+        with self.lock:
+            return self.done.get(key)
+
+
+REPORTS = ReportQueue()
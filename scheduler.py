@@ -0,0 +1,132 @@
+# scheduler.py — background refresh with stale-while-revalidate
+# Each source is refreshed on its own interval by a worker thread. Readers
+# always get the last good value immediately; a failed or empty refresh keeps
+# the previous value and is retried after a backoff.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from config import REFRESH_RETRY, REFRESH_COLD_TIMEOUT
+from instrument import span
+
+
+class Source:
+    def __init__(self, name, fn, interval):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.value = None
+        self.updated = None        # wall-clock time of the last good value
+        self.due = 0.0             # monotonic time of the next refresh
+        self.running = False
+        self.requested = False     # refresh() called while a refresh was running
+        self.error = None
+        self.ready = threading.Event()
+
+
+class Scheduler:
+    def __init__(self, tick=1.0, workers=4):
+        self.sources = {}
+        self.tick = tick
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh")
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.listeners = []        # called with the source name after each publish
+
+    def register(self, name, fn, interval, primer=None):
+        # primer: optional cheap synchronous loader (e.g. from disk) used to
+        # serve something before the first network refresh completes
+        src = Source(name, fn, interval)
+        self.sources[name] = src
+        if primer is not None:
+            try:
+                value = primer()
+                if not _is_empty(value):
+                    self._publish(src, value)
+            except Exception as e:
+                print("[WARN] Could not prime " + name + ": " + str(e))
+        return src
+
+    def subscribe(self, fn):
+        self.listeners.append(fn)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self.thread.start()
+        return self
+
+    def get(self, name, wait=True, timeout=REFRESH_COLD_TIMEOUT):
+        # Last good value; only blocks on a cold start, until the first attempt ends.
+        src = self.sources[name]
+        if src.value is None and wait:
+            self.refresh(name)
+            src.ready.wait(timeout)
+        return src.value
+
+    def refresh(self, name=None):
+        # Trigger a background refresh of one source (or all), without blocking.
+        with self.lock:
+            for src in ([self.sources[name]] if name else self.sources.values()):
+                src.due = 0.0
+                src.requested = src.running
+        self.wake.set()
+
+    def status(self):
+        return {
+            name: {"updated": src.updated, "running": src.running,
+                   "interval": src.interval, "error": src.error}
+            for name, src in self.sources.items()
+        }
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            with self.lock:
+                due = [s for s in self.sources.values() if not s.running and s.due <= now]
+                for src in due:
+                    src.running = True
+            for src in due:
+                self.pool.submit(self._refresh, src)
+            self.wake.wait(self.tick)
+            self.wake.clear()
+
+    def _refresh(self, src):
+        try:
+            with span("refresh." + src.name):
+                value = src.fn()
+            if _is_empty(value):
+                raise ValueError("empty result")
+            self._publish(src, value)
+            src.error = None
+            next_in = src.interval
+        except Exception as e:
+            src.error = str(e)
+            print("[WARN] Refresh of " + src.name + " failed, serving last good value: " + str(e))
+            next_in = min(REFRESH_RETRY, src.interval)
+        finally:
+            with self.lock:
+                src.running = False
+                src.due = 0.0 if src.requested else time.monotonic() + next_in
+                src.requested = False
+            src.ready.set()          # first attempt done, even if it failed
+
+    def _publish(self, src, value):
+        src.value = value            # single reference swap: readers never see a partial value
+        src.updated = time.time()
+        for fn in self.listeners:
+            try:
+                fn(src.name)
+            except Exception as e:
+                print("[WARN] Listener failed after " + src.name + " refresh: " + str(e))
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    if isinstance(value, tuple) and value and hasattr(value[0], "empty"):
+        return value[0].empty
+    return False
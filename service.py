@@ -0,0 +1,248 @@
+# service.py — headless data service
+# Keeps the enriched FRED frame, quotes, news and alert state warm in memory
+# (snapshot.SnapshotHub) and serves them as JSON over a small asyncio HTTP
+# server with ETag / If-None-Match and gzip.
+#   python service.py [--host 127.0.0.1] [--port 8765]
+#   python service.py --source replay --store /tmp/cold --latency 0.05 0.5 --error-rate 0.1
+#       air-gapped load test from recordings (see sources.py), cold store
+#
+# Endpoints (GET/HEAD):
+#   /health                      source status and snapshot version
+#   /snapshot                    everything the dashboard needs, in one document
+#   /fred?lookback=1Y&columns=a,b  enriched frame (optionally sliced)
+#   /last  /quotes  /news  /alerts
+#   /metrics[?format=prometheus]  instrumentation spans (see instrument.py)
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+import urllib.request
+from urllib.error import HTTPError
+from urllib.parse import urlsplit, parse_qs
+import pandas as pd
+
+from alerts import AlertEngine
+from compact import CompactFrame
+from config import (
+    SERVICE_HOST, SERVICE_PORT, SERVICE_POLL, STORE_DIR, SOURCE_MODE, REPLAY_LATENCY, REPLAY_ERROR_RATE,
+)
+from data import MarketData, lookback_offsets
+from instrument import METRICS, timed
+from live import LiveData, NewsFeed
+from snapshot import Snapshot, SnapshotHub
+from sources import Faults, fred_client, news_client, yf_client
+from store import SeriesStore
+
+GZIP_MIN_BYTES = 1024
+PROMETHEUS_TYPE = "text/plain; version=0.0.4"
+
+
+def frame_to_json(df):
+    return json.loads(df.to_json(orient="split", date_format="iso"))
+
+def frame_from_json(obj, dates=True):
+    df = pd.read_json(io.StringIO(json.dumps(obj)), orient="split", convert_dates=False)
+    if dates and len(df):
+        df.index = pd.to_datetime(df.index).tz_localize(None)
+    return df
+
+def alerts_to_json(engine):
+    label, color = engine.risk_label()
+    return {
+        "score": engine.risk_score(), "label": label, "color": color,
+        "alerts": [{"key": a.key, "label": a.label, "value": a.value,
+                    "level": a.level, "message": a.message} for a in engine.alerts],
+    }
+
+
+# ── SERVER ──────────────────────────────────────────────────
+class DataService:
+    def __init__(self, hub=None):
+        self.hub = hub if hub is not None else SnapshotHub()
+        self.cache = {}            # (snapshot id, target) -> (body, gzipped, etag)
+        self.cache_snap = None
+
+    def render(self, snap, path, query):
+        if path == "/health":
+            return {"version": snap.version if snap else None,
+                    "built": snap.built if snap else None,
+                    "sources": self.hub.scheduler.status()}
+        if snap is None:
+            return None
+        if path == "/snapshot":
+            return {"version": snap.version, "built": snap.built,
+                    "fred": frame_to_json(snap.df), "quotes": frame_to_json(snap.quotes),
+                    "news": frame_to_json(snap.news)}
+        if path == "/fred":
+            columns = query["columns"][0].split(",") if "columns" in query else None
+            start = snap.offsets[query["lookback"][0]] if "lookback" in query else 0
+            return frame_to_json(snap.frame.frame(start=start, columns=columns))
+        if path == "/last":
+            return json.loads(snap.frame.row(-1).to_json())
+        if path == "/quotes":
+            return frame_to_json(snap.quotes)
+        if path == "/news":
+            return frame_to_json(snap.news)
+        if path == "/alerts":
+            return alerts_to_json(snap.engine)
+        return None
+
+    @timed("service.respond")
+    def respond(self, target):
+        # -> (status, body, gzipped body, etag)
+        url = urlsplit(target)
+        if url.path == "/metrics":
+            if parse_qs(url.query).get("format") == ["prometheus"]:
+                return 200, METRICS.to_prometheus().encode(), None, None
+            return 200, json.dumps(METRICS.to_json()).encode(), None, None
+        snap = self.hub.current
+        if snap is not self.cache_snap:
+            self.cache, self.cache_snap = {}, snap
+        if url.path != "/health" and target in self.cache:
+            return (200,) + self.cache[target]
+        try:
+            obj = self.render(snap, url.path, parse_qs(url.query))
+        except Exception as e:
+            return 400, json.dumps({"error": str(e)}).encode(), None, None
+        if obj is None:
+            status = 503 if snap is None and url.path in ("/snapshot", "/fred", "/last", "/quotes", "/news", "/alerts") else 404
+            return status, json.dumps({"error": "not available"}).encode(), None, None
+        body = json.dumps(obj, default=str).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        zipped = gzip.compress(body, 5) if len(body) >= GZIP_MIN_BYTES else None
+        if url.path != "/health":
+            self.cache[target] = (body, zipped, etag)
+        return 200, body, zipped, etag
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                k, _, v = line.decode("latin-1").partition(":")
+                headers[k.strip().lower()] = v.strip()
+            parts = request.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] not in ("GET", "HEAD"):
+                await self._write(writer, 405, b"", {})
+                return
+            method, target = parts[0], parts[1]
+            status, body, zipped, etag = await asyncio.to_thread(self.respond, target)
+            prometheus = target.startswith("/metrics") and "format=prometheus" in target
+            extra = {"Content-Type": PROMETHEUS_TYPE if prometheus else "application/json"}
+            if etag:
+                extra["ETag"] = etag
+                extra["Cache-Control"] = "no-cache"
+                if etag in [t.strip() for t in headers.get("if-none-match", "").split(",")]:
+                    await self._write(writer, 304, b"", extra)
+                    return
+            if zipped is not None and "gzip" in headers.get("accept-encoding", ""):
+                body = zipped
+                extra["Content-Encoding"] = "gzip"
+            if etag or zipped is not None:
+                extra["Vary"] = "Accept-Encoding"
+            await self._write(writer, status, b"" if method == "HEAD" else body, extra, len(body))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write(self, writer, status, body, headers, length=None):
+        reason = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed", 503: "Service Unavailable"}[status]
+        head = "HTTP/1.1 " + str(status) + " " + reason + "\r\n"
+        headers = dict(headers, **{"Content-Length": str(len(body) if length is None else length),
+                                   "Connection": "close"})
+        head += "".join(k + ": " + v + "\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        self.hub.start(stream=False)
+        server = await asyncio.start_server(self.handle, host, port)
+        print("[INFO] MKTTRK data service on http://" + host + ":" + str(port))
+        async with server:
+            await server.serve_forever()
+
+
+# ── CLIENT ──────────────────────────────────────────────────
+class ServiceClient:
+    # Drop-in for SnapshotHub in the dashboard and report jobs: polls /snapshot
+    # at most every SERVICE_POLL seconds with If-None-Match, so an unchanged
+    # snapshot costs one 304 and no JSON parsing.
+    def __init__(self, url, poll=SERVICE_POLL):
+        self.url = url.rstrip("/")
+        self.poll = poll
+        self.live = LiveData()        # price history stays on-demand
+        self.tape = None              # no streaming tape; the dashboard falls back to snapshot quotes
+        self.current = None
+        self.etag = None
+        self.checked = 0.0
+
+    def get(self, timeout=None):
+        if time.monotonic() - self.checked < self.poll and self.current is not None:
+            return self.current
+        self.checked = time.monotonic()
+        req = urllib.request.Request(self.url + "/snapshot", headers={"Accept-Encoding": "gzip"})
+        if self.etag:
+            req.add_header("If-None-Match", self.etag)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout or 30) as resp:
+                body = resp.read()
+                if resp.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                self.etag = resp.headers.get("ETag")
+        except HTTPError as e:
+            if e.code != 304:
+                print("[WARN] Data service error: " + str(e))
+            return self.current
+        except OSError as e:
+            print("[WARN] Data service unreachable: " + str(e))
+            return self.current
+        doc = json.loads(body)
+        frame = CompactFrame.from_frame(frame_from_json(doc["fred"]))
+        self.current = Snapshot(
+            frame=frame, version=doc["version"],
+            quotes=frame_from_json(doc["quotes"], dates=False),
+            news=frame_from_json(doc["news"], dates=False),
+            engine=AlertEngine(frame.row(-1)), offsets=lookback_offsets(frame.index),
+            built=doc["built"],
+        )
+        return self.current
+
+    def refresh(self, name=None):
+        # the service refreshes on its own schedule; just re-poll on next get()
+        self.checked = 0.0
+
+    def history(self, ticker, period):
+        return self.live.get_history(ticker, period)
+
+
+def make_hub(source=SOURCE_MODE, store=STORE_DIR, latency=REPLAY_LATENCY, error_rate=REPLAY_ERROR_RATE):
+    faults = Faults(tuple(latency), error_rate)
+    yf = yf_client(source, faults=faults)
+    live = LiveData(yf=yf, newsapi=news_client(source, faults=faults))
+    live.news = NewsFeed(live.newsapi, path=os.path.join(store, "news.json"))
+    market = MarketData(fred=fred_client(source, faults=faults), store=SeriesStore(store))
+    return SnapshotHub(market=market, live=live)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MKTTRK headless data service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--source", choices=["live", "record", "replay"], default=SOURCE_MODE)
+    parser.add_argument("--store", default=STORE_DIR, help="series/news store; an empty one profiles a cold start")
+    parser.add_argument("--latency", type=float, nargs=2, default=REPLAY_LATENCY, metavar=("LO", "HI"),
+                        help="replay only: injected delay per call, seconds")
+    parser.add_argument("--error-rate", type=float, default=REPLAY_ERROR_RATE,
+                        help="replay only: share of calls that fail")
+    args = parser.parse_args()
+    hub = make_hub(args.source, args.store, args.latency, args.error_rate)
+    asyncio.run(DataService(hub).serve(args.host, args.port))
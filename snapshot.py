@@ -0,0 +1,172 @@
+# snapshot.py — process-wide, read-only market snapshot
+# The hub owns the only MarketData/LiveData instances and the background
+# scheduler. Every time a source refreshes it builds a new Snapshot and swaps
+# it in with a single reference assignment; sessions keep whichever snapshot
+# they read at the start of their run, without pickling or copying frames.
+# The FRED data stays compact (compact.CompactFrame); view() expands only the
+# rows of the requested lookback, once per frame version: the expanded frame
+# is memoized and shared (read-only) by every session and rerun. The cross-asset correlation matrix is kept
+# up to date incrementally by its own source (analytics.RollingCorrelation).
+import threading
+import time
+from dataclasses import dataclass, field
+import pandas as pd
+
+from alerts import AlertEngine
+from analytics import RollingCorrelation, daily_changes
+from compact import CompactFrame
+from config import REFRESH_INTERVALS, REFRESH_COLD_TIMEOUT, CORR_HISTORY_PERIOD, HISTORY_PERIOD
+from data import MarketData, lookback_offsets
+from instrument import timed
+from live import LiveData, QuoteTape
+from scheduler import Scheduler
+
+NEWS_PAGE_SIZE = 12     # articles shown from the news buffer
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    # Treat every frame as read-only: the same objects are shared by all sessions.
+    frame: CompactFrame
+    version: str
+    quotes: pd.DataFrame
+    news: pd.DataFrame
+    engine: AlertEngine
+    offsets: dict
+    built: float = field(default_factory=time.time)
+    corr: dict = field(default_factory=dict)    # date -> correlation matrix, oldest first
+    views: dict = field(default_factory=dict, repr=False, compare=False)   # (start, columns) -> DataFrame
+
+    @property
+    def df(self):
+        return self.frame.frame()
+
+    def view(self, lookback, columns=None):
+        # Keyed by start row rather than label, so views survive a snapshot
+        # rebuilt with the same version but next-day offsets.
+        key = (self.offsets[lookback], None if columns is None else tuple(columns))
+        df = self.views.get(key)
+        if df is None:
+            df = self.views[key] = self.frame.frame(start=key[0], columns=columns)
+        return df
+
+
+class SnapshotHub:
+    def __init__(self, market=None, live=None):
+        self.market = market if market is not None else MarketData()
+        self.live = live if live is not None else LiveData()
+        self.scheduler = Scheduler()
+        self.tape = QuoteTape()
+        self.corr = RollingCorrelation()
+        self.current = None
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.scheduler.subscribe(self._rebuild)
+        self.scheduler.register("fred", self._fred, REFRESH_INTERVALS["fred"], primer=self._fred_from_disk)
+        self.scheduler.register("quotes", self.live.get_quotes, REFRESH_INTERVALS["quotes"])
+        self.scheduler.register("news", self._news, REFRESH_INTERVALS["news"], primer=self._news_from_disk)
+        self.scheduler.register("corr", self._corr, REFRESH_INTERVALS["corr"])
+        self.scheduler.register("history", self._history, REFRESH_INTERVALS["history"])
+
+    def start(self, stream=True):
+        # stream=False skips the quote tape (nothing to push it to when headless)
+        self.scheduler.start()
+        if stream:
+            self.tape.start(self.live)
+        return self
+
+    def get(self, timeout=REFRESH_COLD_TIMEOUT):
+        # Current snapshot; only waits on a cold start until FRED has loaded once.
+        if self.current is None:
+            self.scheduler.refresh("fred")
+            self.ready.wait(timeout)
+        return self.current
+
+    def refresh(self, name=None):
+        self.scheduler.refresh(name)
+
+    def history(self, ticker, period):
+        # Price chart bars, stale-while-revalidate: whatever the cache holds is
+        # served at once and a stale entry is refreshed in the background. Only
+        # a miss (before the first warm-up reaches the ticker, or a period it
+        # doesn't cover) fetches that one ticker on demand.
+        cache = self.live.history
+        bars = cache.cached(ticker, period)
+        if bars is None:
+            return self.live.get_history(ticker, period)
+        if cache.is_stale(ticker):
+            self.scheduler.refresh("history")
+        return bars
+
+    def _fred(self):
+        with self.market.lock:
+            self.market.refresh()
+            return self.market.frame, self.market.version
+
+    def _fred_from_disk(self):
+        if not self.market.store.has("SP500"):
+            return None
+        with self.market.lock:
+            self.market.load(fetch=False)
+            return self.market.frame, self.market.version
+
+    def _news(self):
+        return self.live.news.refresh(NEWS_PAGE_SIZE)
+
+    def _news_from_disk(self):
+        return self.live.news.frame(NEWS_PAGE_SIZE)
+
+    def _corr(self):
+        # Pushes the days the correlation engine hasn't seen yet (all FRED
+        # series + every ticker), after rewinding any it had seen that were
+        # rewritten since, and returns its snapshots.
+        if self._value("fred") is None:
+            self.scheduler.sources["fred"].ready.wait(REFRESH_COLD_TIMEOUT)
+        fred = self._value("fred")
+        if fred is None:
+            return None
+        frame, _ = fred
+        closes = pd.DataFrame({
+            t: self.live.get_history(t, CORR_HISTORY_PERIOD).get("Close", pd.Series(dtype="float64"))
+            for t in self.live.tickers
+        })
+        tail = self.corr.window + self.corr.keep
+        self.corr.update(daily_changes(frame, closes, start=max(len(frame) - tail, 0)))
+        return self.corr.history() or None
+
+    def _history(self):
+        # Keeps HISTORY_PERIOD of bars warm for every ticker; a fresh entry is
+        # a cache hit, a stale one only refetches its last bars.
+        rows = {t: len(self.live.get_history(t, HISTORY_PERIOD)) for t in self.live.tickers}
+        return rows if any(rows.values()) else None
+
+    def _value(self, name):
+        src = self.scheduler.sources.get(name)
+        return src.value if src is not None else None
+
+    @timed("snapshot.rebuild")
+    def _rebuild(self, name):
+        fred = self._value("fred")
+        if fred is None or name == "history":     # history lives in live.HISTORY, not the snapshot
+            return
+        frame, version = fred
+        quotes = self._value("quotes")
+        news = self._value("news")
+        with self.lock:
+            prev = self.current
+            if name == "fred" and prev is not None and prev.version != version:
+                self.scheduler.refresh("corr")      # new days to push
+            views = {}
+            if prev is not None and prev.version == version:
+                engine, offsets, views = prev.engine, prev.offsets, prev.views
+                if pd.Timestamp.fromtimestamp(prev.built).date() != pd.Timestamp.today().date():
+                    offsets = lookback_offsets(frame.index)
+            else:
+                engine, offsets = AlertEngine(frame.row(-1)), lookback_offsets(frame.index)
+            self.current = Snapshot(
+                frame=frame, version=version,
+                quotes=quotes if quotes is not None else pd.DataFrame(),
+                news=news if news is not None else pd.DataFrame(),
+                engine=engine, offsets=offsets, corr=self._value("corr") or {}, views=views,
+            )
+        self.ready.set()
@@ -0,0 +1,349 @@
+# sources.py — pluggable upstream clients: live, record, replay
+# Every FRED / yfinance / NewsAPI call goes through the client returned by
+# fred_client(), yf_client() and news_client(), chosen by SOURCE_MODE:
+#   "live"    the real libraries, as before
+#   "record"  the real libraries, with every response merged into SOURCE_DIR
+#   "replay"  only SOURCE_DIR, no network; optional injected latency/errors
+# Recordings are kept per series / ticker / query rather than per exact call,
+# so replay still answers the incremental requests the caches make later
+# (a newer observation_start, a different stale-ticker subset, a moved
+# NewsAPI from= watermark) by slicing what was recorded.
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+import pandas as pd
+import yfinance
+from fredapi import Fred
+from newsapi import NewsApiClient
+from newsapi.utils import stringify_date_param
+from config import (
+    FRED_API_KEY, NEWS_API_KEY, SOURCE_MODE, SOURCE_DIR,
+    REPLAY_LATENCY, REPLAY_ERROR_RATE, REPLAY_SEED, FETCH_TIMEOUT,
+)
+
+# yfinance period -> how far back it reaches (None = full history)
+PERIODS = {
+    "5d":  pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y":  pd.DateOffset(years=1),
+    "2y":  pd.DateOffset(years=2),
+    "5y":  pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+    "max": None,
+}
+
+
+class ReplayError(RuntimeError):
+    pass
+
+
+# ── RECORDINGS ──────────────────────────────────────────────
+class Recordings:
+    # One pickle per (source, key) under root, written atomically.
+    def __init__(self, root=SOURCE_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def _path(self, source, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in key)[:40]
+        return os.path.join(self.root, source, safe + "." + digest + ".pkl")
+
+    def load(self, source, key):
+        path = self._path(source, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, source, key, value):
+        path = self._path(source, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def merge(self, source, key, value, combine):
+        # read-modify-write under one lock so concurrent recorders don't lose updates
+        with self.lock:
+            old = self.load(source, key)
+            self.save(source, key, value if old is None else combine(old, value))
+
+
+class Faults:
+    # Injected latency (uniform in [lo, hi] seconds) and failure rate for replay.
+    def __init__(self, latency=REPLAY_LATENCY, error_rate=REPLAY_ERROR_RATE, seed=REPLAY_SEED):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def inject(self, what):
+        with self.lock:
+            delay = self.rng.uniform(*self.latency)
+            fail = self.rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ReplayError("injected failure: " + what)
+
+
+def _combine_series(old, new):
+    return new.combine_first(old).sort_index()
+
+def _naive_bars(bars):
+    # Ticker.history() returns exchange-local tz-aware bars, download() naive
+    # ones; recordings keep one convention (naive dates) so they can be merged.
+    bars = bars.copy()
+    idx = pd.DatetimeIndex(bars.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    bars.index = idx.normalize()
+    return bars[~bars.index.duplicated(keep="last")]
+
+def _record(recordings, source, key, value, combine):
+    # A failed recording must never break the upstream call it wraps.
+    try:
+        recordings.merge(source, key, value, combine)
+    except Exception as e:
+        print("[WARN] Could not record " + source + " " + key + ": " + str(e))
+
+def _combine_articles(old, new):
+    by_url = {a.get("url"): a for a in old}
+    by_url.update((a.get("url"), a) for a in new)
+    return sorted(by_url.values(), key=lambda a: a.get("publishedAt") or "", reverse=True)
+
+
+# ── FRED ────────────────────────────────────────────────────
+class TimeoutFred(Fred):
+    # fredapi opens every URL with urlopen(url) and no socket timeout, so a hung
+    # request would keep its worker thread (and interpreter exit) waiting
+    # forever. Same request/parse as fredapi's private fetch helper, with one.
+    def __init__(self, api_key=None, timeout=FETCH_TIMEOUT, **kwargs):
+        super().__init__(api_key=api_key, **kwargs)
+        self.timeout = timeout
+
+    def _Fred__fetch_data(self, url):
+        url += "&api_key=" + self.api_key
+        try:
+            response = urllib.request.urlopen(url, timeout=self.timeout)
+            root = ET.fromstring(response.read())
+        except urllib.error.HTTPError as exc:
+            root = ET.fromstring(exc.read())
+            raise ValueError(root.get("message"))
+        return root
+
+
+class RecordingFred:
+    def __init__(self, client, recordings):
+        self.client = client
+        self.recordings = recordings
+
+    def get_series(self, series_id, observation_start=None, **kwargs):
+        s = self.client.get_series(series_id, observation_start=observation_start, **kwargs)
+        _record(self.recordings, "fred", series_id, s, _combine_series)
+        return s
+
+    def get_series_info(self, series_id):
+        info = self.client.get_series_info(series_id)
+        _record(self.recordings, "fred_info", series_id, info, lambda old, new: new)
+        return info
+
+
+class ReplayFred:
+    def __init__(self, recordings, faults=None):
+        self.recordings = recordings
+        self.faults = faults if faults is not None else Faults()
+
+    def get_series(self, series_id, observation_start=None, **kwargs):
+        self.faults.inject("fred " + series_id)
+        s = self.recordings.load("fred", series_id)
+        if s is None:
+            raise ReplayError("no recording for FRED series " + series_id)
+        if observation_start is not None:
+            s = s[s.index >= pd.Timestamp(observation_start)]
+        return s
+
+    def get_series_info(self, series_id):
+        self.faults.inject("fred info " + series_id)
+        info = self.recordings.load("fred_info", series_id)
+        if info is None:
+            raise ReplayError("no recording for FRED series info " + series_id)
+        return info
+
+
+# ── YFINANCE ────────────────────────────────────────────────
+def bars_by_ticker(data, tickers):
+    # {ticker: bars} from a download(group_by="ticker") result, whose columns
+    # are flat for a single ticker on older yfinance versions
+    if isinstance(data.columns, pd.MultiIndex):
+        return {t: data[t] for t in tickers if t in data.columns.get_level_values(0)}
+    return {tickers[0]: data} if len(tickers) == 1 else {}
+
+
+class RecordingYF:
+    # Same surface as the yfinance module for what live.py uses.
+    def __init__(self, module, recordings):
+        self.module = module
+        self.recordings = recordings
+
+    def download(self, tickers, **kwargs):
+        data = self.module.download(tickers, **kwargs)
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        for ticker, bars in bars_by_ticker(data, tickers).items():
+            _record(self.recordings, "yfinance", ticker, _naive_bars(bars.dropna(how="all")), _combine_series)
+        return data
+
+    def Ticker(self, ticker):
+        return _RecordingTicker(self, ticker)
+
+
+class _RecordingTicker:
+    def __init__(self, parent, ticker):
+        self.parent = parent
+        self.ticker = ticker
+
+    def history(self, period="1mo", **kwargs):
+        bars = self.parent.module.Ticker(self.ticker).history(period=period, **kwargs)
+        _record(self.parent.recordings, "yfinance", self.ticker, _naive_bars(bars), _combine_series)
+        return bars
+
+
+class ReplayYF:
+    # Periods are measured back from the last recorded bar, not from today,
+    # so an old recording still answers "5d" with its last five days.
+    def __init__(self, recordings, faults=None):
+        self.recordings = recordings
+        self.faults = faults if faults is not None else Faults()
+
+    def _bars(self, ticker, period):
+        bars = self.recordings.load("yfinance", ticker)
+        if bars is None:
+            raise ReplayError("no recording for ticker " + ticker)
+        offset = PERIODS.get(period)
+        if offset is None or bars.empty:
+            return bars
+        return bars[bars.index > bars.index[-1] - offset]
+
+    def download(self, tickers, period="1mo", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.faults.inject("yfinance download " + ",".join(tickers))
+        frames = {}
+        for t in tickers:
+            try:
+                frames[t] = self._bars(t, period)
+            except ReplayError as e:
+                print("[WARN] " + str(e))     # yfinance also skips unknown tickers
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def Ticker(self, ticker):
+        return _ReplayTicker(self, ticker)
+
+
+class _ReplayTicker:
+    def __init__(self, parent, ticker):
+        self.parent = parent
+        self.ticker = ticker
+
+    def history(self, period="1mo", **kwargs):
+        self.parent.faults.inject("yfinance history " + self.ticker)
+        return self.parent._bars(self.ticker, period)
+
+
+# ── NEWSAPI ─────────────────────────────────────────────────
+class RecordingNews:
+    def __init__(self, client, recordings):
+        self.client = client
+        self.recordings = recordings
+
+    def get_everything(self, q=None, **kwargs):
+        response = self.client.get_everything(q=q, **kwargs)
+        _record(self.recordings, "newsapi", q or "", response.get("articles", []), _combine_articles)
+        return response
+
+
+class ReplayNews:
+    # Answers from every article recorded for the query, newest first, honouring
+    # from_param and paging like the real endpoint.
+    def __init__(self, recordings, faults=None):
+        self.recordings = recordings
+        self.faults = faults if faults is not None else Faults()
+
+    def get_everything(self, q=None, from_param=None, page=1, page_size=20, **kwargs):
+        self.faults.inject("newsapi " + str(q))
+        articles = self.recordings.load("newsapi", q or "")
+        if articles is None:
+            raise ReplayError("no recording for news query " + repr(q))
+        if from_param:
+            # same validation as the real client, which rejects e.g. a trailing "Z"
+            from_param = stringify_date_param(from_param)
+            articles = [a for a in articles if (a.get("publishedAt") or "") >= from_param]
+        page = page or 1
+        return {"status": "ok", "totalResults": len(articles),
+                "articles": articles[(page - 1) * page_size:page * page_size]}
+
+
+# ── FACTORIES ───────────────────────────────────────────────
+def fred_client(mode=None, recordings=None, faults=None):
+    mode = mode or SOURCE_MODE
+    recordings = recordings or Recordings()
+    if mode == "replay":
+        return ReplayFred(recordings, faults)
+    client = TimeoutFred(api_key=FRED_API_KEY)
+    return RecordingFred(client, recordings) if mode == "record" else client
+
+def yf_client(mode=None, recordings=None, faults=None):
+    mode = mode or SOURCE_MODE
+    recordings = recordings or Recordings()
+    if mode == "replay":
+        return ReplayYF(recordings, faults)
+    return RecordingYF(yfinance, recordings) if mode == "record" else yfinance
+
+def news_client(mode=None, recordings=None, faults=None):
+    mode = mode or SOURCE_MODE
+    recordings = recordings or Recordings()
+    if mode == "replay":
+        return ReplayNews(recordings, faults)
+    client = NewsApiClient(api_key=NEWS_API_KEY)
+    return RecordingNews(client, recordings) if mode == "record" else client
+
+
+# ── RECORD ──────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Capture one full session (all series from START_DATE, max price history
+    # per ticker, latest quotes and news) into SOURCE_DIR for later replay.
+    import argparse
+    import tempfile
+    from config import YFINANCE_TICKERS, NEWS_QUERY
+    from data import MarketData
+    from live import HistoryCache, LiveData, NewsFeed
+    from store import SeriesStore
+
+    parser = argparse.ArgumentParser(description="Record upstream responses for replay")
+    parser.add_argument("--dir", default=SOURCE_DIR)
+    args = parser.parse_args()
+    recordings = Recordings(args.dir)
+    store = tempfile.mkdtemp()      # empty store, so every series is fetched in full
+    md = MarketData(fred=fred_client("record", recordings), store=SeriesStore(store))
+    md.load()
+    yf = yf_client("record", recordings)
+    live = LiveData(history=HistoryCache(yf=yf), yf=yf, newsapi=news_client("record", recordings))
+    live.news = NewsFeed(live.newsapi, path=os.path.join(store, "news.json"))
+    for ticker in YFINANCE_TICKERS:
+        live.get_history(ticker, "max")
+    live.get_quotes(max_age=0)
+    live.news.refresh()
+    print("Recorded " + str(len(md.df.columns)) + " FRED columns, " + str(len(YFINANCE_TICKERS))
+          + " tickers and " + str(len(live.news.articles)) + " articles for " + repr(NEWS_QUERY)
+          + " into " + args.dir)
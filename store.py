@@ -0,0 +1,84 @@
+# store.py — persistent on-disk series store
+# One pair of memory-mapped .npy columns per series (dates, values) plus a
+# small meta.json recording the FRED id, the backfill start date and, once
+# known, the series' native frequency (FRED "frequency_short": D, W, M, Q, A...).
+import json
+import os
+import numpy as np
+import pandas as pd
+from config import STORE_DIR
+
+
+class SeriesStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.meta_path = os.path.join(root, "meta.json")
+        self.meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+
+    def _path(self, key, column):
+        return os.path.join(self.root, key + "." + column + ".npy")
+
+    def has(self, key):
+        return key in self.meta and os.path.exists(self._path(key, "values"))
+
+    def read(self, key):
+        if not self.has(key):
+            return pd.Series(dtype="float64")
+        dates  = np.load(self._path(key, "dates"), mmap_mode="r")
+        values = np.load(self._path(key, "values"), mmap_mode="r")
+        return pd.Series(values, index=pd.DatetimeIndex(dates.astype("datetime64[ns]")), name=key)
+
+    def last_date(self, key):
+        if not self.has(key):
+            return None
+        dates = np.load(self._path(key, "dates"), mmap_mode="r")
+        return pd.Timestamp(dates[-1]) if len(dates) else None
+
+    def next_start(self, key, series_id, start):
+        # First observation date to request from FRED for this series.
+        start = pd.Timestamp(start)
+        m = self.meta.get(key)
+        if m is None or m["id"] != series_id or start < pd.Timestamp(m["start"]):
+            return start
+        last = self.last_date(key)
+        return start if last is None else last + pd.Timedelta(days=1)
+
+    def frequency(self, key):
+        return self.meta.get(key, {}).get("frequency")
+
+    def set_frequency(self, key, frequency):
+        if key in self.meta and self.meta[key].get("frequency") != frequency:
+            self.meta[key]["frequency"] = frequency
+            self._write_meta()
+
+    def append(self, key, series_id, series, start):
+        new = pd.to_numeric(series, errors="coerce").astype("float64")
+        new.index = pd.DatetimeIndex(new.index).astype("datetime64[ns]")
+        m = self.meta.get(key)
+        if m is not None and m["id"] == series_id and pd.Timestamp(start) > pd.Timestamp(m["start"]):
+            old = self.read(key)
+            new = pd.concat([old[old.index < new.index.min()] if len(new) else old, new])
+            start = m["start"]
+        new = new[~new.index.duplicated(keep="last")].sort_index()
+        self._write(key, "dates", new.index.values.astype("datetime64[D]"))
+        self._write(key, "values", new.to_numpy(dtype="float64"))
+        keep = {"frequency": m["frequency"]} if m is not None and m["id"] == series_id and "frequency" in m else {}
+        self.meta[key] = {"id": series_id, "start": str(pd.Timestamp(start).date()), **keep}
+        self._write_meta()
+
+    def _write(self, key, column, arr):
+        path = self._path(key, column)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, path)
+
+    def _write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.meta_path)